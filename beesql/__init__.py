@@ -1,8 +1,19 @@
 # -*- coding: utf-8 -*-
-import pymysql
-
-from .settings import DATABASE_MYSQL, DATABASE_SQLITE
-from .exceptions import BeeSQLError
+import concurrent.futures
+
+from .settings import DATABASE_MYSQL, DATABASE_SQLITE, EXPORT_FORMAT_CSV, LOAD_FORMAT_CSV, DRIVER_PYMYSQL
+from .settings import PRIORITY_INTERACTIVE, LOCAL_INFILE_REFUSED_ERRORS
+from .exceptions import BeeSQLError, QueryTimeoutError
+from .cancel import Deadline
+from .coalesce import SingleFlight
+from .loader import BatchLoader
+from .inserter import BufferedInserter
+from .rollup import Rollup
+from .hedge import HedgeBudget
+from .drivers import drivers as driver_classes, get_driver, CURSOR_DICT, CURSOR_TUPLE, CURSOR_STREAM
+from .export import export_cursor
+from .bulk import LoadResult, load_data_sql, read_batches, read_header
+from .utils import alias, column
 from .query.base import Statement, ColumnSelector
 from .query.mysql import MySQLQuery
 
@@ -13,10 +24,11 @@ class Row(object):
         self.values = kwargs.copy()
 
     def __getattr__(self, key):
-        if key in self.values:
-            return self.values[key]
+        values = self.__dict__.get('values', {})
+        if key in values:
+            return values[key]
 
-        super().__getattr__(key)
+        raise AttributeError(key)
 
     def __repr__(self):
         return '< {} >: {}'.format('Row', self.values)
@@ -28,6 +40,7 @@ class Row(object):
 class Rows(object):
     def __init__(self, rows):
         self.rows = rows
+        self._indexes = {}
 
     def __repr__(self):
         return '< {} >: {}'.format('Rows', self.count)
@@ -45,15 +58,59 @@ class Rows(object):
     def all(self):
         return self.rows[:]
 
+    def _cached(self, kind, column, build):
+        key = (kind, column)
+        try:
+            return self._indexes[key]
+        except KeyError:
+            index = self._indexes[key] = build(column)
+            return index
+
+    def _build_column(self, column):
+        return [getattr(row, column) for row in self.rows]
+
+    def _build_unique_index(self, column):
+        index = {}
+        for row in self.rows:
+            key = getattr(row, column)
+            if key in index:
+                raise BeeSQLError('Duplicate value {!r} in column {}'.format(key, column))
+
+            index[key] = row
+
+        return index
+
+    def _build_group_index(self, column):
+        index = {}
+        for row in self.rows:
+            index.setdefault(getattr(row, column), []).append(row)
+
+        return {key: Rows(group) for key, group in index.items()}
+
+    def column(self, column):
+        """ List of the values of column, in row order. """
+        return self._cached('column', column, self._build_column)[:]
+
+    def index_by(self, column):
+        """ Dict of row by value of column, which must be unique. Built once and cached. """
+        return self._cached('index', column, self._build_unique_index)
+
+    def group_by_key(self, column):
+        """ Dict of Rows by value of column. Built once and cached. """
+        return self._cached('group', column, self._build_group_index)
+
 
 class Connection(object):
-    def __init__(self, username, password, db=None, host='localhost', port=3306, unix_socket=None):
+    def __init__(self, username, password, db=None, host='localhost', port=3306, unix_socket=None,
+                 local_infile=False, driver=DRIVER_PYMYSQL):
         self.username = username
         self.password = password
         self.db = db
         self.host = host
         self.port = port
         self.unix_socket = unix_socket
+        self.local_infile = local_infile
+        self.driver = get_driver(driver) if isinstance(driver, str) else driver
         self._connection = None
 
     def __repr__(self):
@@ -70,35 +127,192 @@ class Connection(object):
 class MySQLConnection(Connection):
 
     def is_open(self):
-        return bool(self._connection) and self._connection.open
+        return bool(self._connection) and self.driver.is_open(self._connection)
 
     def open(self):
         if self.is_open():
             return
 
-        if not self.unix_socket:
-            self._connection = pymysql.connect(user=self.username, passwd=self.password, db=self.db,
-                                               host=self.host, port=self.port, autocommit=True)
-        else:
-            self._connection = pymysql.connect(user=self.username, passwd=self.password, db=self.db,
-                                               unix_socket=self.unix_socket, autocommit=True)
+        self._connection = self.driver.connect(user=self.username, password=self.password, db=self.db,
+                                               host=self.host, port=self.port, unix_socket=self.unix_socket,
+                                               local_infile=self.local_infile)
 
-    def execute(self, query):
+    def _validate(self, query):
         if isinstance(query, ColumnSelector):
             raise BeeSQLError('No operation performed on {}'.format(query))
 
         if not isinstance(query, Statement):
             raise BeeSQLError('Expected instance of {}. Got instance of {}'.format(Statement, query.__class__))
 
+    def _side_connection(self):
+        return self.__class__(username=self.username, password=self.password, db=self.db,
+                              host=self.host, port=self.port, unix_socket=self.unix_socket, driver=self.driver)
+
+    def thread_id(self):
+        return self._connection.thread_id()
+
+    def kill_query(self, thread_id=None):
+        """ Cancel the statement running on this connection, from a separate connection. """
+        thread_id = self.thread_id() if thread_id is None else thread_id
+        with self._side_connection() as side:
+            cursor = side._connection.cursor()
+            cursor.execute('KILL QUERY {}'.format(int(thread_id)))
+
+    def _recover(self):
+        """ Bring the connection back to an idle state after a cancelled statement. """
+        try:
+            cursor = self._connection.cursor()
+            cursor.execute('DO 0')
+        except self.driver.OperationalError:
+            self.close()
+
+    def execute(self, query, timeout=None):
+        self._validate(query)
+
         rows = []
         sql = query.get_sql()
-        cursor = self._connection.cursor(pymysql.cursors.DictCursor)
-        cursor.execute(sql)
-        results = cursor.fetchall()
+        row_factory = query.row_factory
+        cursor = self._connection.cursor(self.driver.cursor_class(CURSOR_TUPLE if row_factory else CURSOR_DICT))
+        thread_id = self.thread_id()
+        deadline = Deadline(timeout, lambda: self.kill_query(thread_id))
+        try:
+            with deadline:
+                cursor.execute(sql)
+                results = cursor.fetchall()
+        except self.driver.Error:
+            if not deadline.expired:
+                raise
+
+            self._recover()
+            raise QueryTimeoutError('Statement cancelled after {} seconds: {}'.format(timeout, sql))
+
+        if deadline.expired:
+            self._recover()
+
+        if row_factory:
+            columns = [desc[0] for desc in cursor.description or []]
+            return Rows(row_factory.make_rows(columns, results))
+
         rows = [Row(**r) for r in results]
 
         return Rows(rows)
 
+    def execute_sql(self, sql):
+        """ Run sql as is and return the cursor, for statements the query builder does not make. """
+        cursor = self._connection.cursor()
+        cursor.execute(sql)
+        return cursor
+
+    def approximate_count(self, query, timeout=None):
+        """ Estimate the result of a Count statement without counting rows.
+
+        Unfiltered counts of a table read TABLE_ROWS from information_schema. Other counts multiply the
+        EXPLAIN row estimates, scaled by the filtered percentage, of the tables in the outer select.
+        """
+        table = query.query._table
+        if isinstance(table, str) and not query.get_secondary_keywords():
+            schema, _, name = table.rpartition('.')
+            stats = query.query.db.query('information_schema.TABLES').select(alias('TABLE_ROWS', 'count'))
+            stats.where('TABLE_SCHEMA').eq(schema or column('DATABASE()'))._and('TABLE_NAME').eq(name)
+            rows = self.execute(stats, timeout=timeout)
+            # views have no TABLE_ROWS, they are explained
+            if rows.count and rows[0].count is not None:
+                return Rows([Row(count=int(rows[0].count))])
+
+        # plans without row estimates, such as an impossible WHERE, match no rows
+        estimate = None
+        for step in self.execute(query.explain(), timeout=timeout):
+            plan = step.values
+            if plan.get('select_type') not in ('SIMPLE', 'PRIMARY') or plan.get('rows') is None:
+                continue
+
+            filtered = plan.get('filtered')
+            rows = float(plan['rows']) * (100.0 if filtered is None else float(filtered)) / 100.0
+            estimate = rows if estimate is None else estimate * rows
+
+        return Rows([Row(count=int(round(estimate or 0)))])
+
+    def export(self, query, target, format=EXPORT_FORMAT_CSV, batch_size=1000, compress=False, timeout=None):
+        """ Stream the results of query into target without buffering the result set.
+
+        The statement is killed with QueryTimeoutError when the export outlives timeout seconds.
+        """
+        self._validate(query)
+
+        sql = query.get_sql()
+        cursor = self._connection.cursor(self.driver.cursor_class(CURSOR_STREAM))
+        thread_id = self.thread_id()
+        deadline = Deadline(timeout, lambda: self.kill_query(thread_id))
+        try:
+            with deadline:
+                try:
+                    cursor.execute(sql)
+                    res = export_cursor(cursor, target, format=format, batch_size=batch_size, compress=compress)
+                finally:
+                    cursor.close()
+        except self.driver.Error:
+            if not deadline.expired:
+                raise
+
+            self._recover()
+            raise QueryTimeoutError('Export cancelled after {} seconds: {}'.format(timeout, sql))
+
+        if deadline.expired:
+            self._recover()
+
+        return res
+
+    def _warnings(self):
+        return list(self._connection.show_warnings() or [])
+
+    def local_infile_allowed(self):
+        if not self.local_infile:
+            return False
+
+        cursor = self._connection.cursor()
+        cursor.execute('SELECT @@GLOBAL.local_infile')
+        row = cursor.fetchone()
+        return bool(row and int(row[0]))
+
+    def load_file(self, query, path, columns=None, format=LOAD_FORMAT_CSV, header=True, batch_size=1000):
+        """ Load a delimited file into query's table.
+
+        Uses LOAD DATA LOCAL INFILE when the server allows it, otherwise, or when the local file is
+        refused, falls back to chunked multi-row inserts. Any other error of LOAD DATA is raised. When no
+        columns are given they are taken from the file header.
+        """
+        if columns is None and header:
+            columns = read_header(path, format)
+
+        if self.local_infile_allowed():
+            cursor = self._connection.cursor()
+            try:
+                sql = load_data_sql(query.db, query.table, path, columns, format, header)
+                cursor.execute(sql)
+            except self.driver.Error as e:
+                # only a refused local file falls back to inserts, other errors may come after a partial load
+                if not e.args or e.args[0] not in LOCAL_INFILE_REFUSED_ERRORS:
+                    raise
+            else:
+                return LoadResult(cursor.rowcount, self._warnings(), 'load_data')
+
+        if not columns:
+            raise BeeSQLError('Columns are required to load {} without a header'.format(path))
+
+        loaded = 0
+        warnings = []
+        cursor = self._connection.cursor()
+        for batch in read_batches(path, format, header, batch_size):
+            insert = query.db.query(query.table).insert(*columns)
+            for values in batch:
+                insert.row(*values)
+
+            cursor.execute(insert.get_sql())
+            loaded += cursor.rowcount
+            warnings.extend(self._warnings())
+
+        return LoadResult(loaded, warnings, 'insert')
+
     def close(self):
         if self.is_open():
             self._connection.close()
@@ -112,7 +326,9 @@ class DB(object):
     }
 
     def __init__(self, database_type, db_name=None, username=None, password=None,
-                 host='localhost', port=3306, unix_socket=None):
+                 host='localhost', port=3306, unix_socket=None, timeout=None, coalesce=False,
+                 driver=DRIVER_PYMYSQL, result_cache=None, cache_all=False, hedge_budget=5.0, scheduler=None,
+                 priority=PRIORITY_INTERACTIVE, guard=None):
 
         if database_type not in self.supported_databases:
             raise BeeSQLError('database_type: {} not supported'.format(database_type))
@@ -124,6 +340,30 @@ class DB(object):
         self.host = host
         self.port = port
         self.unix_socket = unix_socket
+        self.timeout = timeout
+        self.singleflight = SingleFlight() if coalesce else None
+        self.driver = get_driver(driver)
+        self.rollups = []
+        self.result_cache = result_cache
+        self.cache_all = cache_all
+        self.hedge_budget = HedgeBudget(hedge_budget)
+        self.scheduler = scheduler
+        self.priority = priority
+        self.guard = guard
+
+    def __getstate__(self):
+        # process pools pickle statements, and with them their DB
+        state = self.__dict__.copy()
+        state['singleflight'] = self.singleflight is not None
+        state['driver'] = next(name for name, driver in driver_classes.items() if isinstance(self.driver, driver))
+        state['hedge_budget'] = self.hedge_budget.percent
+        return state
+
+    def __setstate__(self, state):
+        state['singleflight'] = SingleFlight() if state['singleflight'] else None
+        state['driver'] = get_driver(state['driver'])
+        state['hedge_budget'] = HedgeBudget(state['hedge_budget'])
+        self.__dict__.update(state)
 
     def query(self, table=None, table_alias=None):
         if not self.db_name:
@@ -136,12 +376,59 @@ class DB(object):
     def __repr__(self):
         return '<DB {}:{}'.format(self.database_type, self.db_name)
 
-    def connect(self):
+    def connect(self, **kwargs):
         Connection = self.database_type_to_connection[self.database_type]
         conn = Connection(username=self.username, password=self.password, db=self.db_name,
-                          host=self.host, port=self.port, unix_socket=self.unix_socket)
+                          host=self.host, port=self.port, unix_socket=self.unix_socket, driver=self.driver,
+                          **kwargs)
         return conn
 
+    def loader(self, table, key='id', columns=None, window=0.002, max_batch_size=100):
+        """ BatchLoader combining lookups of rows by key made within window seconds into one IN query. """
+        return BatchLoader(self, table, key=key, columns=columns, window=window, max_batch_size=max_batch_size)
+
+    def buffered_inserter(self, table, columns, max_rows=1000, max_bytes=1024 * 1024, max_delay=1.0,
+                          max_queued=10000, on_error=None):
+        """ BufferedInserter writing rows added from any thread into table with multi-row inserts. """
+        return BufferedInserter(self, table, columns, max_rows=max_rows, max_bytes=max_bytes, max_delay=max_delay,
+                                max_queued=max_queued, on_error=on_error)
+
+    def execute_many(self, statements, max_concurrency=8, timeout=None):
+        """ Run independent statements concurrently, each on its own connection, max_concurrency at a time.
+
+        Returns the results in the order of statements. The exception of a failed statement takes the
+        place of its result, without stopping the others.
+        """
+        statements = list(statements)
+        if not statements:
+            return []
+
+        workers = max(1, min(max_concurrency, len(statements)))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(statement.execute, timeout=timeout) for statement in statements]
+
+        results = []
+        for future in futures:
+            error = future.exception()
+            results.append(error if error is not None else future.result())
+
+        return results
+
+    def rollup(self, table, group_by, aggregates, granularity=None, time_column=None, key='id', name=None,
+               route=True, lag=1000):
+        """ Declare a Rollup of aggregates over table. Once refreshed, compatible selects read from it. """
+        rollup = Rollup(self, table, group_by, aggregates, granularity=granularity, time_column=time_column, key=key,
+                        name=name, route=route, lag=lag)
+        self.rollups.append(rollup)
+        return rollup
+
+    def route(self, select):
+        """ Select reading the result of select from a rollup, or None. """
+        for rollup in self.rollups:
+            statement = rollup.rewrite(select)
+            if statement is not None:
+                return statement
+
     def use(self, db_name):
         self.db_name = db_name
         return self
@@ -154,6 +441,6 @@ class DB(object):
     def escape(self, item):
         if self.database_type == DATABASE_MYSQL:
             str_item = str(item)
-            return pymysql.escape_string(str_item)
+            return self.driver.escape_string(str_item)
 
         return item
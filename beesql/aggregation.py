@@ -1,26 +1,33 @@
 class AggregationField(object):
+    __slots__ = ('column_name', 'as_name')
+
     def __init__(self, column_name, as_name=None):
         self.column_name = column_name
         self.as_name = as_name
 
 
 class SumAggregationField(AggregationField):
+    __slots__ = ()
     QUERY_PART_NAME = 'sum_aggregation'
 
 
 class AvgAggregationField(AggregationField):
+    __slots__ = ()
     QUERY_PART_NAME = 'avg_aggregation'
 
 
 class CountAggregationField(AggregationField):
+    __slots__ = ()
     QUERY_PART_NAME = 'count_aggregation'
 
 
 class MaxAggregationField(AggregationField):
+    __slots__ = ()
     QUERY_PART_NAME = 'max_aggregation'
 
 
 class MinAggregationField(AggregationField):
+    __slots__ = ()
     QUERY_PART_NAME = 'min_aggregation'
 
 
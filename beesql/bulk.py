@@ -0,0 +1,76 @@
+import csv
+import itertools
+
+from .exceptions import BeeSQLError
+from .settings import LOAD_FORMAT_CSV, LOAD_FORMAT_TSV
+
+
+class LoadResult(object):
+    """ Outcome of a bulk load. """
+    def __init__(self, rows, warnings, method):
+        self.rows = rows
+        self.warnings = warnings
+        self.method = method
+
+    def __repr__(self):
+        return '< {} >: {} rows, {} warnings ({})'.format('LoadResult', self.rows, len(self.warnings), self.method)
+
+
+delimiters = {
+    LOAD_FORMAT_CSV: ',',
+    LOAD_FORMAT_TSV: '\t',
+}
+
+
+def get_delimiter(format):
+    try:
+        return delimiters[format]
+    except KeyError:
+        raise BeeSQLError('Load format: {} not supported'.format(format))
+
+
+def read_header(path, format):
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f, delimiter=get_delimiter(format)):
+            return row
+
+    raise BeeSQLError('{} is empty'.format(path))
+
+
+def line_terminator(path):
+    """ \r\n when the first line of the file ends with it, as the csv module writes them, otherwise \n. """
+    with open(path, 'rb') as f:
+        line = f.readline()
+
+    return '\r\n' if line.endswith(b'\r\n') else '\n'
+
+
+def load_data_sql(db, table, path, columns, format, header):
+    """ LOAD DATA LOCAL INFILE statement matching the csv module's dialect and the file's line endings. """
+    sql = ("LOAD DATA LOCAL INFILE '{path}' INTO TABLE {table} "
+           "FIELDS TERMINATED BY '{delimiter}' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+           "LINES TERMINATED BY '{terminator}'")
+    sql = sql.format(path=db.escape(path), table=table, delimiter=db.escape(get_delimiter(format)),
+                     terminator=db.escape(line_terminator(path)))
+    if header:
+        sql = '{} IGNORE 1 LINES'.format(sql)
+
+    if columns:
+        sql = '{} ({})'.format(sql, ', '.join(columns))
+
+    return sql
+
+
+def read_batches(path, format, header, batch_size):
+    """ Yield lists of at most batch_size rows from a delimited file. """
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f, delimiter=get_delimiter(format))
+        if header:
+            next(reader, None)
+
+        while True:
+            batch = list(itertools.islice(reader, batch_size))
+            if not batch:
+                break
+
+            yield batch
@@ -0,0 +1,196 @@
+import contextlib
+import hashlib
+import mmap
+import os
+import pickle
+import tempfile
+import threading
+import time
+from stat import S_ISDIR
+
+from .exceptions import BeeSQLError
+
+SHARED_MEMORY_DIR = '/dev/shm'
+
+
+def default_path(name):
+    # /dev/shm is memory backed, so entries are shared through the page cache without touching disk
+    base = SHARED_MEMORY_DIR if os.path.isdir(SHARED_MEMORY_DIR) else tempfile.gettempdir()
+    return os.path.join(base, 'beesql-cache-{}-{}'.format(os.getuid() if hasattr(os, 'getuid') else 0, name))
+
+
+def private_dir(path):
+    """ Create path readable by the current user only, or check that an existing one is.
+
+    Entries are unpickled, so a directory another user could write to would let them run code in
+    every process reading the cache.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+
+    info = os.lstat(path)
+    if not S_ISDIR(info.st_mode):
+        raise BeeSQLError('Cache path {} is not a directory'.format(path))
+
+    if hasattr(os, 'getuid') and (info.st_uid != os.getuid() or info.st_mode & 0o077):
+        raise BeeSQLError('Cache directory {} should be owned by the current user with mode 0700'.format(path))
+
+    return path
+
+
+def _stable(value):
+    # classes and functions by name rather than by their repr, which holds a memory address
+    if isinstance(value, tuple):
+        return '({})'.format(', '.join(_stable(item) for item in value))
+
+    if callable(value):
+        return '{}.{}'.format(getattr(value, '__module__', ''), getattr(value, '__qualname__', repr(value)))
+
+    return repr(value)
+
+
+class SharedResultCache(object):
+    """ Result sets shared between processes, one pickled file per statement in a shared memory directory.
+
+    Files are written to a temporary name and renamed into place, so readers never see a partial
+    entry. Their modification time holds the expiry, so expired entries and, when the cache holds more
+    than max_bytes, the entries expiring soonest are evicted without being read. Entries are read
+    through mmap from the page cache the processes share, only the unpickled rows are per process.
+    The directory is private to the current user, one other users can write to is refused. Entries
+    that can not be read are treated as misses and deleted, writes that fail are dropped, both are
+    counted in errors and never fail the statement.
+    """
+    def __init__(self, path=None, ttl=60, max_bytes=64 * 1024 * 1024, name='default'):
+        self.path = path or default_path(name)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+        private_dir(self.path)
+
+    def __repr__(self):
+        return '< {} >: {} {} hits, {} misses, {} evictions, {} errors'.format(
+            'SharedResultCache', self.path, self.hits, self.misses, self.evictions, self.errors)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(hits=0, misses=0, evictions=0, errors=0)
+        return state
+
+    def key(self, statement):
+        """ Key of the result of statement: the server it runs on, its sql and how its rows are built.
+
+        Execution options such as the priority or the cache ttl are left out, so statements differing only
+        by them share entries.
+        """
+        db = statement.query.db
+        server = (db.host, db.port, db.unix_socket)
+        return hashlib.sha1(_stable((server, statement.result_key())).encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key)
+
+    def get(self, key):
+        """ Cached result for key, or None when it is missing or expired. """
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                if stat.st_mtime < time.time() or not stat.st_size:
+                    self.misses += 1
+                    return None
+
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    view = memoryview(data)
+                    try:
+                        result = pickle.loads(view)
+                    finally:
+                        view.release()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            # stale or incompatible entry, or an unreadable file
+            self.errors += 1
+            self.misses += 1
+            with contextlib.suppress(OSError):
+                self.delete(key)
+            return None
+
+        self.hits += 1
+        return result
+
+    def put(self, key, result, ttl=None):
+        """ Store result for ttl seconds. Returns False when it can not be pickled, is too large or the write fails. """
+        try:
+            data = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, AttributeError, TypeError):
+            return False
+
+        if len(data) > self.max_bytes:
+            return False
+
+        ttl = self.ttl if ttl is None else ttl
+        path = self._entry_path(key)
+        tmp_path = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+
+            now = time.time()
+            os.utime(tmp_path, (now, now + ttl))
+            os.replace(tmp_path, path)
+            self.evict()
+        except OSError:
+            # e.g. the shared memory filesystem is full
+            self.errors += 1
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            return False
+
+        return True
+
+    def delete(self, key):
+        try:
+            os.remove(self._entry_path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for entry, _ in self._entries():
+            self.delete(entry.name)
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith('.tmp'):
+                continue
+
+            try:
+                entries.append((entry, entry.stat()))
+            except FileNotFoundError:
+                pass
+
+        return entries
+
+    def size(self):
+        return sum(stat.st_size for _, stat in self._entries())
+
+    def evict(self):
+        """ Remove expired entries, then the entries expiring soonest until the cache fits in max_bytes. """
+        now = time.time()
+        entries = sorted(self._entries(), key=lambda item: item[1].st_mtime)
+        total = sum(stat.st_size for _, stat in entries)
+        for entry, stat in entries:
+            if stat.st_mtime >= now and total <= self.max_bytes:
+                break
+
+            self.delete(entry.name)
+            self.evictions += 1
+            total -= stat.st_size
@@ -0,0 +1,43 @@
+import threading
+
+
+class Deadline(object):
+    """ Calls cancel from a timer thread if the guarded block outlives timeout seconds.
+
+    Leaving the block waits for an in-flight cancel to finish, so a cancel never lands on
+    whatever the connection runs next.
+    """
+    def __init__(self, timeout, cancel):
+        self.timeout = timeout
+        self.cancel = cancel
+        self.expired = False
+        self._done = False
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def __enter__(self):
+        if self.timeout:
+            self._timer = threading.Timer(self.timeout, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+
+        return self
+
+    def _expire(self):
+        with self._lock:
+            if self._done:
+                return
+
+            self.expired = True
+            try:
+                self.cancel()
+            except Exception:
+                # the statement keeps running until it completes on its own
+                pass
+
+    def __exit__(self, type, value, traceback):
+        with self._lock:
+            self._done = True
+
+        if self._timer:
+            self._timer.cancel()
@@ -0,0 +1,76 @@
+import threading
+
+
+class _Call(object):
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """ Shares one in-flight call, and its result, between concurrent callers using the same key.
+
+    executions counts calls that ran, deduplicated counts callers that waited on another caller's call.
+    """
+    def __init__(self):
+        self.executions = 0
+        self.deduplicated = 0
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+
+    def __repr__(self):
+        return '< {} >: {} executions, {} deduplicated'.format('SingleFlight', self.executions, self.deduplicated)
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.deduplicated += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+            call.event.set()
+
+        return call.result
+
+    async def do_async(self, key, func):
+        """ Coalescing for coroutines. func runs in the loop's default executor. """
+        # imported here to keep asyncio out of import beesql, it is already loaded inside a running loop
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        async_key = (loop, key)
+        with self._lock:
+            future = self._async_calls.get(async_key)
+            if future is None:
+                future = self._async_calls[async_key] = loop.run_in_executor(None, self.do, key, func)
+                future.add_done_callback(lambda f: self._forget(async_key, f))
+            else:
+                self.deduplicated += 1
+
+        return await asyncio.shield(future)
+
+    def _forget(self, async_key, future):
+        with self._lock:
+            if self._async_calls.get(async_key) is future:
+                del self._async_calls[async_key]
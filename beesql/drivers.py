@@ -0,0 +1,125 @@
+""" MySQL DB-API drivers.
+
+A driver wraps a DB-API module which is imported the first time it is needed, so importing beesql
+does not import a driver.
+"""
+import importlib
+
+from .exceptions import BeeSQLError
+from .settings import DRIVER_PYMYSQL, DRIVER_MYSQLCLIENT
+
+CURSOR_DICT = 'dict'
+CURSOR_TUPLE = 'tuple'
+CURSOR_STREAM = 'stream'
+
+
+class Driver(object):
+    MODULE_NAME = None
+    CURSORS_MODULE_NAME = None
+    CURSOR_CLASS_NAMES = {
+        CURSOR_DICT: 'DictCursor',
+        CURSOR_TUPLE: 'Cursor',
+        CURSOR_STREAM: 'SSCursor',
+    }
+
+    def __init__(self):
+        self._module = None
+        self._cursors = None
+
+    def __repr__(self):
+        return '< {} >: {}'.format(self.__class__.__name__, 'loaded' if self._module else 'not loaded')
+
+    def _load(self):
+        if self._module is None:
+            try:
+                self._cursors = importlib.import_module(self.CURSORS_MODULE_NAME)
+                self._module = importlib.import_module(self.MODULE_NAME)
+            except ImportError as e:
+                raise BeeSQLError('Driver module {} is not installed: {}'.format(self.MODULE_NAME, e))
+
+    @property
+    def module(self):
+        self._load()
+        return self._module
+
+    @property
+    def cursors(self):
+        self._load()
+        return self._cursors
+
+    @property
+    def Error(self):
+        return self.module.Error
+
+    @property
+    def OperationalError(self):
+        return self.module.OperationalError
+
+    @property
+    def InternalError(self):
+        return self.module.InternalError
+
+    def cursor_class(self, kind):
+        return getattr(self.cursors, self.CURSOR_CLASS_NAMES[kind])
+
+    def connect(self, user, password, db, host, port, unix_socket, local_infile):
+        kwargs = {
+            'user': user,
+            'passwd': password,
+            'db': db,
+            'autocommit': True,
+            'local_infile': local_infile,
+        }
+        if unix_socket:
+            kwargs['unix_socket'] = unix_socket
+        else:
+            kwargs['host'] = host
+            kwargs['port'] = port
+
+        return self.module.connect(**kwargs)
+
+    def is_open(self, connection):
+        return bool(connection.open)
+
+    def escape_string(self, value):
+        raise NotImplementedError
+
+
+class PyMySQLDriver(Driver):
+    """ Pure python driver, https://github.com/PyMySQL/PyMySQL """
+    MODULE_NAME = 'pymysql'
+    CURSORS_MODULE_NAME = 'pymysql.cursors'
+
+    def escape_string(self, value):
+        return self.module.converters.escape_string(value)
+
+
+class MySQLClientDriver(Driver):
+    """ C driver built on libmysqlclient, https://github.com/PyMySQL/mysqlclient """
+    MODULE_NAME = 'MySQLdb'
+    CURSORS_MODULE_NAME = 'MySQLdb.cursors'
+
+    def connect(self, user, password, db, host, port, unix_socket, local_infile):
+        return super().connect(user, password, db, host, port, unix_socket, int(bool(local_infile)))
+
+    def escape_string(self, value):
+        return self.module.escape_string(value).decode('utf-8')
+
+
+drivers = {
+    DRIVER_PYMYSQL: PyMySQLDriver,
+    DRIVER_MYSQLCLIENT: MySQLClientDriver,
+}
+
+_instances = {}
+
+
+def get_driver(name):
+    """ Shared driver instance for name. The driver module is not imported until it is used. """
+    if name not in drivers:
+        raise BeeSQLError('driver: {} not supported'.format(name))
+
+    if name not in _instances:
+        _instances[name] = drivers[name]()
+
+    return _instances[name]
@@ -1,2 +1,17 @@
 class BeeSQLError(Exception):
     pass
+
+
+class QueryTimeoutError(BeeSQLError):
+    """ Statement did not complete before its deadline and was cancelled. """
+    pass
+
+
+class AdmissionRejected(BeeSQLError):
+    """ Statement was not admitted to run: the queue was full or its deadline could not be met. """
+    pass
+
+
+class CostLimitExceeded(BeeSQLError):
+    """ Statement plan is over the limits of the DB cost guard. """
+    pass
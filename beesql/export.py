@@ -0,0 +1,129 @@
+import csv
+import datetime
+import decimal
+import gzip
+import io
+import json
+
+from .exceptions import BeeSQLError
+from .settings import EXPORT_FORMAT_CSV, EXPORT_FORMAT_JSONL
+
+
+class ExportResult(object):
+    """ Outcome of a statement export. """
+    def __init__(self, rows, bytes_written):
+        self.rows = rows
+        self.bytes_written = bytes_written
+
+    def __repr__(self):
+        return '< {} >: {} rows, {} bytes'.format('ExportResult', self.rows, self.bytes_written)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+
+    return str(value)
+
+
+def _csv_value(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+
+    return value
+
+
+class CSVEncoder(object):
+    def __init__(self, columns):
+        self.columns = columns
+
+    def header(self):
+        return self.encode([self.columns])
+
+    def encode(self, rows):
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator='\n').writerows([[_csv_value(value) for value in row] for row in rows])
+        return buf.getvalue()
+
+
+class JSONLinesEncoder(object):
+    def __init__(self, columns):
+        self.columns = columns
+
+    def header(self):
+        return ''
+
+    def encode(self, rows):
+        columns = self.columns
+        lines = [json.dumps(dict(zip(columns, row)), default=_json_default) for row in rows]
+        lines.append('')
+        return '\n'.join(lines)
+
+
+encoders = {
+    EXPORT_FORMAT_CSV: CSVEncoder,
+    EXPORT_FORMAT_JSONL: JSONLinesEncoder,
+}
+
+
+def get_encoder(format):
+    try:
+        return encoders[format]
+    except KeyError:
+        raise BeeSQLError('Export format: {} not supported'.format(format))
+
+
+def _open_target(target, compress):
+    """ Return (fileobj, is_text, owned) for a path or file object. """
+    if isinstance(target, str):
+        if compress or target.endswith('.gz'):
+            return gzip.open(target, 'wb'), False, True
+
+        return open(target, 'wb'), False, True
+
+    is_text = isinstance(target, io.TextIOBase)
+    if compress:
+        if is_text:
+            raise BeeSQLError('Compressed export requires a binary file object')
+
+        return gzip.GzipFile(fileobj=target, mode='wb'), False, True
+
+    return target, is_text, False
+
+
+def export_cursor(cursor, target, format=EXPORT_FORMAT_CSV, batch_size=1000, compress=False):
+    """ Stream the rows of an executed cursor into target, batch_size rows at a time.
+
+    The number of bytes reported is the size of the uncompressed payload.
+    """
+    columns = [desc[0] for desc in cursor.description]
+    encoder = get_encoder(format)(columns)
+    fileobj, is_text, owned = _open_target(target, compress)
+    rows_written = 0
+    bytes_written = 0
+
+    def write(text):
+        data = text.encode('utf-8')
+        fileobj.write(text if is_text else data)
+        return len(data)
+
+    try:
+        bytes_written += write(encoder.header())
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+
+            bytes_written += write(encoder.encode(batch))
+            rows_written += len(batch)
+    finally:
+        if owned:
+            fileobj.close()
+
+    return ExportResult(rows_written, bytes_written)
@@ -0,0 +1,127 @@
+import logging
+import re
+import threading
+from collections import OrderedDict
+
+from .exceptions import BeeSQLError, CostLimitExceeded
+
+GUARD_MODE_REJECT = 'reject'
+GUARD_MODE_LOG = 'log'
+
+logger = logging.getLogger('beesql.guard')
+
+_string_literal = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_number_literal = re.compile(r'\b\d+(?:\.\d+)?\b')
+_placeholder_list = re.compile(r'\?(?:\s*,\s*\?)+')
+
+
+def shape(sql):
+    """ sql with its literal values replaced by ?, lists of them by a single ?. """
+    sql = _number_literal.sub('?', _string_literal.sub('?', sql))
+    return _placeholder_list.sub('?', sql)
+
+
+class QueryPlan(object):
+    """ What EXPLAIN estimates a statement does: rows examined and tables read with a full scan. """
+    def __init__(self, rows_examined, full_scans):
+        self.rows_examined = rows_examined
+        self.full_scans = full_scans
+
+    def __repr__(self):
+        return '< {} >: {} rows examined, full scans of {}'.format(
+            'QueryPlan', self.rows_examined, ', '.join(table for table, _ in self.full_scans) or 'no table')
+
+    @classmethod
+    def from_explain(cls, rows):
+        """ Sum over the selects of the plan of the product of the rows each of their tables reads. """
+        selects = OrderedDict()
+        full_scans = []
+        for step in rows:
+            plan = step.values
+            estimate = float(plan.get('rows') or 0)
+            selects[plan.get('id')] = selects.get(plan.get('id'), 1.0) * estimate
+            if plan.get('type') == 'ALL':
+                full_scans.append((plan.get('table'), int(estimate)))
+
+        return cls(int(sum(selects.values())), full_scans)
+
+
+class CostGuard(object):
+    """ Checks the EXPLAIN plan of statements before they run.
+
+    A statement is a violation when its plan examines more than max_rows rows, or reads a table of
+    denylist with a full scan. Violations raise CostLimitExceeded in reject mode and are logged to the
+    beesql.guard logger in log mode. strict, meant for development, rejects and also treats any full
+    scan of more than max_scan_rows rows as a violation. Plans are cached per statement shape, its sql
+    without literal values, so statements differing only by their values are explained once.
+    """
+    def __init__(self, max_rows=None, denylist=(), mode=GUARD_MODE_REJECT, strict=False, max_scan_rows=1000,
+                 cache_size=1024):
+        if mode not in (GUARD_MODE_REJECT, GUARD_MODE_LOG):
+            raise BeeSQLError('mode should be one of {}, {}'.format(GUARD_MODE_REJECT, GUARD_MODE_LOG))
+
+        self.max_rows = max_rows
+        self.denylist = set(denylist)
+        self.mode = GUARD_MODE_REJECT if strict else mode
+        self.strict = strict
+        self.max_scan_rows = max_scan_rows
+        self.cache_size = cache_size
+        self.violations = 0
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '< {} >: {} mode, {} violations'.format('CostGuard', self.mode, self.violations)
+
+    def __reduce__(self):
+        return (self.__class__, (self.max_rows, self.denylist, self.mode, self.strict, self.max_scan_rows,
+                                 self.cache_size))
+
+    def plan(self, statement, conn, timeout=None):
+        """ QueryPlan of statement, from the cache or from running EXPLAIN on conn within timeout seconds. """
+        db = statement.query.db
+        key = (db.host, db.port, db.unix_socket, db.db_name, shape(statement.get_sql()))
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                return plan
+
+        plan = QueryPlan.from_explain(conn.execute(statement.explain(), timeout=timeout))
+        with self._lock:
+            self._plans[key] = plan
+            while len(self._plans) > self.cache_size:
+                self._plans.popitem(last=False)
+
+        return plan
+
+    def problems(self, plan):
+        problems = []
+        if self.max_rows is not None and plan.rows_examined > self.max_rows:
+            problems.append('examines about {} rows, over the budget of {}'.format(plan.rows_examined, self.max_rows))
+
+        for table, rows in plan.full_scans:
+            if table in self.denylist or (self.strict and rows > self.max_scan_rows):
+                problems.append('full scan of {} ({} rows)'.format(table, rows))
+
+        return problems
+
+    def check(self, statement, conn, timeout=None):
+        try:
+            plan = self.plan(statement, conn, timeout=timeout)
+        except conn.driver.Error as e:
+            logger.warning('Could not explain %s: %s', statement.get_sql(), e)
+            return
+
+        problems = self.problems(plan)
+        if not problems:
+            return
+
+        with self._lock:
+            self.violations += 1
+
+        message = '{}: {}'.format('; '.join(problems), statement.get_sql())
+        if self.mode == GUARD_MODE_REJECT:
+            raise CostLimitExceeded(message)
+
+        logger.warning('Statement over cost limits, %s', message)
@@ -0,0 +1,133 @@
+import contextlib
+import queue
+import threading
+
+
+class HedgeBudget(object):
+    """ Caps hedged attempts to percent of the hedgeable requests, so hedging can not multiply load. """
+    def __init__(self, percent=5.0):
+        self.percent = percent
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '< {} >: {} hedges for {} requests ({}%), {} won'.format(
+            'HedgeBudget', self.hedges, self.requests, self.percent, self.hedge_wins)
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def acquire(self):
+        """ Whether one more hedge stays within the budget, counting it if so. """
+        with self._lock:
+            if (self.hedges + 1) * 100 > self.percent * self.requests:
+                return False
+
+            self.hedges += 1
+            return True
+
+    def record_win(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+
+class _Attempt(object):
+    """ One run of the statement on its own connection, in a thread.
+
+    The thread runs in a scheduler slot, so statements it runs itself do not queue for another one.
+    release_slot is set for an attempt which took its own slot, freed when it finishes.
+    """
+    def __init__(self, statement, timeout, done, scheduler=None, priority=None, release_slot=False):
+        self.statement = statement
+        self.timeout = timeout
+        self.done = done
+        self.scheduler = scheduler
+        self.priority = priority
+        self.release_slot = release_slot
+        self.conn = None
+        self.thread_id = None
+        self.result = None
+        self.error = None
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        thread = threading.Thread(target=self.run)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def run(self):
+        slot = self.scheduler.holding() if self.scheduler is not None else contextlib.suppress()
+        try:
+            with slot, self.statement.query.db.connect() as conn:
+                with self._lock:
+                    self.conn = conn
+                    self.thread_id = conn.thread_id()
+
+                self.result = self.statement._execute(conn, timeout=self.timeout)
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._lock:
+                self.finished = True
+
+            if self.release_slot:
+                self.scheduler.release_slot(self.priority)
+
+            self.done.put(self)
+
+    def cancel(self):
+        """ Kill the statement if it is still running. """
+        with self._lock:
+            if self.finished or self.thread_id is None:
+                return
+
+            try:
+                self.conn.kill_query(self.thread_id)
+            except Exception:
+                # the attempt runs to completion and its result is dropped
+                pass
+
+
+def hedged_execute(statement, timeout, hedge_after, budget, scheduler=None, priority=None):
+    """ Run statement, and again on a second connection if it has not answered after hedge_after seconds.
+
+    The first attempt to succeed wins and the other one is killed. Without budget left, only the first
+    attempt runs. With a scheduler, the first attempt uses the slot of the caller and the second one
+    only starts when it gets a slot of its own without waiting.
+    """
+    done = queue.Queue()
+    attempts = [_Attempt(statement, timeout, done, scheduler, priority).start()]
+    budget.record_request()
+    try:
+        first = done.get(timeout=hedge_after)
+    except queue.Empty:
+        has_slot = scheduler is None or scheduler.try_acquire(priority)
+        if has_slot and budget.acquire():
+            attempts.append(_Attempt(statement, timeout, done, scheduler, priority,
+                                     release_slot=scheduler is not None).start())
+        elif has_slot and scheduler is not None:
+            scheduler.release_slot(priority)
+
+        first = done.get()
+
+    pending = len(attempts) - 1
+    while first.error is not None and pending:
+        first = done.get()
+        pending -= 1
+
+    for attempt in attempts:
+        if attempt is not first:
+            attempt.cancel()
+
+    if first.error is not None:
+        raise first.error
+
+    if first is not attempts[0]:
+        budget.record_win()
+
+    return first.result
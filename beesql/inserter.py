@@ -0,0 +1,212 @@
+import atexit
+import queue
+import threading
+import time
+
+from .exceptions import BeeSQLError
+
+
+class InserterMetrics(object):
+    """ Counters of a BufferedInserter. Latencies are in seconds. """
+    def __init__(self):
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.batches = 0
+        self.max_batch_size = 0
+        self.last_flush_latency = None
+        self.max_flush_latency = 0.0
+        self.total_flush_latency = 0.0
+
+    def __repr__(self):
+        return '< {} >: {} rows in {} batches, {} failed rows'.format(
+            'InserterMetrics', self.rows_written, self.batches, self.rows_failed)
+
+    @property
+    def avg_batch_size(self):
+        return (self.rows_written + self.rows_failed) / self.batches if self.batches else 0
+
+    @property
+    def avg_flush_latency(self):
+        return self.total_flush_latency / self.batches if self.batches else 0.0
+
+    def record(self, size, latency, failed):
+        self.batches += 1
+        if failed:
+            self.rows_failed += size
+        else:
+            self.rows_written += size
+
+        self.max_batch_size = max(self.max_batch_size, size)
+        self.last_flush_latency = latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        self.total_flush_latency += latency
+
+
+class _Flush(object):
+    def __init__(self):
+        self.event = threading.Event()
+
+
+_CLOSE = object()
+
+
+def _row_size(values):
+    # rough size of the row in the VALUES list of the insert
+    return sum(len(str(value)) + 3 for value in values) + 3
+
+
+class BufferedInserter(object):
+    """ Write-behind buffer inserting rows into table with multi-row inserts from a background thread.
+
+    A batch is flushed when it holds max_rows rows or about max_bytes of values, or max_delay seconds
+    after its first row. add() blocks while max_queued rows are waiting, and raises BeeSQLError if the
+    queue is still full after timeout seconds. Rows left in the buffer are flushed by close(), which
+    also runs at interpreter exit. Failed batches are counted in metrics and passed to on_error.
+    """
+    def __init__(self, db, table, columns, max_rows=1000, max_bytes=1024 * 1024, max_delay=1.0, max_queued=10000,
+                 on_error=None):
+        if not columns:
+            raise BeeSQLError('Buffered inserts expect one or more columns')
+
+        self.db = db
+        self.table = table
+        self.columns = list(columns)
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.on_error = on_error
+        self.metrics = InserterMetrics()
+        self.last_error = None
+        self.closed = False
+        self._queue = queue.Queue(max_queued)
+        self._close_lock = threading.Lock()
+        self._conn = None
+        self._thread = threading.Thread(target=self._run, name='BufferedInserter({})'.format(table))
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.close)
+
+    def __repr__(self):
+        return '< {} >: {} {} queued'.format('BufferedInserter', self.table, self.queued)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    @property
+    def queued(self):
+        return self._queue.qsize()
+
+    def add(self, *values, timeout=None):
+        """ Queue one row, with a value per column. """
+        if len(values) != len(self.columns):
+            raise BeeSQLError('Expected {} values, got {}'.format(len(self.columns), len(values)))
+
+        self._put(values, timeout)
+
+    def add_many(self, rows, timeout=None):
+        for values in rows:
+            self.add(*values, timeout=timeout)
+
+    def flush(self, timeout=None):
+        """ Insert the rows queued so far and wait for the insert to finish. """
+        marker = _Flush()
+        self._put(marker, timeout)
+        if not marker.event.wait(timeout):
+            raise BeeSQLError('Flush of {} did not finish in {} seconds'.format(self.table, timeout))
+
+    def close(self):
+        """ Flush the remaining rows and stop the background thread. """
+        with self._close_lock:
+            if self.closed:
+                return
+
+            self.closed = True
+
+        atexit.unregister(self.close)
+        self._queue.put(_CLOSE)
+        self._thread.join()
+
+    def _put(self, item, timeout):
+        # close() queues _CLOSE only once the puts which saw the inserter open are queued
+        with self._close_lock:
+            if self.closed:
+                raise BeeSQLError('Buffered inserter for {} is closed'.format(self.table))
+
+            try:
+                self._queue.put(item, timeout=timeout)
+            except queue.Full:
+                raise BeeSQLError('Buffered inserter for {} is full'.format(self.table))
+
+    def _run(self):
+        batch = []
+        size = 0
+        flush_at = None
+        while True:
+            timeout = None if flush_at is None else max(flush_at - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is None or item is _CLOSE or isinstance(item, _Flush):
+                self._flush(batch)
+                batch, size, flush_at = [], 0, None
+                if isinstance(item, _Flush):
+                    item.event.set()
+                elif item is _CLOSE:
+                    break
+
+                continue
+
+            batch.append(item)
+            size += _row_size(item)
+            if flush_at is None:
+                flush_at = time.monotonic() + self.max_delay
+
+            if len(batch) >= self.max_rows or size >= self.max_bytes:
+                self._flush(batch)
+                batch, size, flush_at = [], 0, None
+
+        if self._conn is not None:
+            self._conn.close()
+
+    def _flush(self, batch):
+        if not batch:
+            return
+
+        insert = self.db.query(self.table).insert(*self.columns)
+        for values in batch:
+            insert.row(*values)
+
+        start = time.monotonic()
+        error = None
+        try:
+            if self._conn is None:
+                self._conn = self.db.connect()
+                self._conn.open()
+
+            self._conn.execute(insert, timeout=self.db.timeout)
+        except Exception as e:
+            error = self.last_error = e
+            # the connection may be broken, a new one is opened for the next batch
+            self._drop_connection()
+
+        self.metrics.record(len(batch), time.monotonic() - start, error is not None)
+        if error is not None and self.on_error is not None:
+            try:
+                self.on_error(error, batch)
+            except Exception:
+                pass
+
+    def _drop_connection(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,103 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class BatchLoader(object):
+    """ Batches point lookups on a table into IN queries.
+
+    Keys passed to load() within window seconds, or until max_batch_size keys are waiting, are
+    fetched with one query. Futures are memoized per key for the life of the loader, so a loader
+    is meant to be created per request.
+    """
+    def __init__(self, db, table, key='id', columns=None, window=0.002, max_batch_size=100):
+        self.db = db
+        self.table = table
+        self.key = key
+        self.columns = list(columns or [])
+        if self.columns and key not in self.columns:
+            self.columns.append(key)
+
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._pending = OrderedDict()
+        self._timer = None
+
+    def __repr__(self):
+        return '< {} >: {}.{} {} batches'.format('BatchLoader', self.table, self.key, self.batches)
+
+    def load(self, key):
+        """ Future resolving to the row with key, or None when there is no such row. """
+        batch = None
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future
+
+            future = self._futures[key] = Future()
+            self._pending[key] = future
+            if len(self._pending) >= self.max_batch_size:
+                batch = self._take()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self.dispatch)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if batch:
+            thread = threading.Thread(target=self._fetch, args=(batch,))
+            thread.daemon = True
+            thread.start()
+
+        return future
+
+    def load_many(self, keys):
+        return [self.load(key) for key in keys]
+
+    def dispatch(self):
+        """ Fetch the waiting keys now. """
+        with self._lock:
+            batch = self._take()
+
+        if batch:
+            self._fetch(batch)
+
+    def clear(self, key=None):
+        """ Forget memoized results, of one key or of all keys. """
+        with self._lock:
+            if key is None:
+                self._futures = {k: f for k, f in self._futures.items() if k in self._pending}
+            elif key not in self._pending:
+                self._futures.pop(key, None)
+
+    def _take(self):
+        batch = self._pending
+        self._pending = OrderedDict()
+        if batch:
+            self.batches += 1
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        return batch
+
+    def _fetch(self, batch):
+        try:
+            statement = self.db.query(self.table).select(*self.columns).where(self.key)._in(*batch)
+            rows = statement.execute()
+        except Exception as e:
+            with self._lock:
+                for key in batch:
+                    self._futures.pop(key, None)
+
+            for future in batch.values():
+                future.set_exception(e)
+
+            return
+
+        index = {getattr(row, self.key): row for row in rows}
+        for key, future in batch.items():
+            future.set_result(index.get(key))
@@ -0,0 +1,109 @@
+import threading
+import time
+
+
+class _NoWatermark(object):
+    def __repr__(self):
+        return 'NULL'
+
+
+# last_seen after a full pass found no watermark value, refresh() then fetches the rows that got one
+NO_WATERMARK = _NoWatermark()
+
+
+class MaterializedResult(object):
+    """ Result of a select kept up to date by fetching rows whose watermark moved.
+
+    refresh() fetches rows with watermark >= the highest value seen so far and merges them by key.
+    Rows sharing the last seen watermark are fetched again, so rows committed with that same value
+    are not missed. Deleted rows are only dropped by a full reconcile, run by refresh() every
+    reconcile_interval seconds or with refresh(full=True). When the full pass finds no watermark value,
+    because the result is empty or the column is NULL, refresh() fetches the rows having one.
+    """
+    def __init__(self, statement, key='id', watermark='updated_at', reconcile_interval=None, timeout=None):
+        self.statement = statement.copy()
+        self.key = key
+        self.watermark = watermark
+        self.reconcile_interval = reconcile_interval
+        self.timeout = timeout
+
+        fields = self.statement.fields
+        if fields:
+            for column in (key, watermark):
+                if column not in fields:
+                    fields.append(column)
+
+        self.last_seen = None
+        self.last_reconcile = None
+        self._rows = {}
+        self._rows_class = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '< {} >: {} rows, {} >= {}'.format('MaterializedResult', len(self), self.watermark, self.last_seen)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        return iter(self.all())
+
+    def _reconcile_due(self):
+        if self.last_reconcile is None:
+            return True
+
+        if self.reconcile_interval is None:
+            return False
+
+        return time.monotonic() - self.last_reconcile >= self.reconcile_interval
+
+    def _track(self, row):
+        value = getattr(row, self.watermark)
+        if value is not None and (self.last_seen in (None, NO_WATERMARK) or value > self.last_seen):
+            self.last_seen = value
+
+    def reconcile(self):
+        """ Replace the result set with a full run of the statement. Returns the number of rows. """
+        with self._lock:
+            rows = self.statement.execute(timeout=self.timeout)
+            self._rows_class = type(rows)
+            self._rows = {getattr(row, self.key): row for row in rows}
+            self.last_seen = None
+            for row in rows:
+                self._track(row)
+
+            if self.last_seen is None:
+                self.last_seen = NO_WATERMARK
+
+            self.last_reconcile = time.monotonic()
+            return len(self._rows)
+
+    def refresh(self, full=False):
+        """ Merge rows changed since the last refresh. Returns the number of rows fetched. """
+        if full or self._reconcile_due() or self.last_seen is None:
+            return self.reconcile()
+
+        with self._lock:
+            statement = self.statement.copy()
+            if self.last_seen is NO_WATERMARK:
+                op = statement.query.make('not_null_operator')(statement, self.watermark, None)
+            else:
+                op = statement.query.make('greater_than_or_equal_operator')(statement, self.watermark, self.last_seen)
+            rows = statement.restrict(op).execute(timeout=self.timeout)
+            for row in rows:
+                self._rows[getattr(row, self.key)] = row
+                self._track(row)
+
+            return rows.count
+
+    def get(self, key, default=None):
+        return self._rows.get(key, default)
+
+    def all(self):
+        with self._lock:
+            return list(self._rows.values())
+
+    @property
+    def rows(self):
+        """ Snapshot of the current result set as Rows. """
+        return self._rows_class(self.all())
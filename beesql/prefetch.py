@@ -0,0 +1,62 @@
+from collections import OrderedDict
+
+from .exceptions import BeeSQLError
+from .query.serialize import serializable
+
+
+def attach(row, name, value):
+    values = getattr(row, 'values', None)
+    if isinstance(values, dict):
+        values[name] = value
+        return
+
+    try:
+        setattr(row, name, value)
+    except AttributeError:
+        raise BeeSQLError('Can not attach {} to {}'.format(name, type(row)))
+
+
+@serializable
+class Prefetch(object):
+    """ Loads the rows of a related table for a set of parent rows with chunked IN queries. """
+    def __init__(self, table, on, as_name=None, columns=None, chunk_size=1000):
+        if len(on) != 2:
+            raise BeeSQLError('on expects a (parent column, child column) pair')
+
+        self.table = table
+        self.parent_key, self.child_key = on
+        self.as_name = as_name or table
+        self.columns = list(columns or [])
+        if self.columns and self.child_key not in self.columns:
+            self.columns.append(self.child_key)
+
+        self.chunk_size = chunk_size
+
+    def __repr__(self):
+        return '< {} >: {} on {} = {}'.format('Prefetch', self.table, self.parent_key, self.child_key)
+
+    def key(self):
+        return (self.table, self.parent_key, self.child_key, self.as_name, tuple(self.columns), self.chunk_size)
+
+    def fetch(self, db, conn, parents, **kwargs):
+        """ Attach the grouped child rows of each parent row as a Rows under as_name. """
+        keys = OrderedDict()
+        for parent in parents:
+            key = getattr(parent, self.parent_key)
+            if key is not None:
+                keys[key] = []
+
+        key_list = list(keys)
+        for i in range(0, len(key_list), self.chunk_size):
+            chunk = key_list[i:i + self.chunk_size]
+            statement = db.query(self.table).select(*self.columns).where(self.child_key)._in(*chunk)
+            for child in statement._execute(conn, **kwargs):
+                group = keys.get(getattr(child, self.child_key))
+                if group is not None:
+                    group.append(child)
+
+        RowsClass = type(parents)
+        for parent in parents:
+            attach(parent, self.as_name, RowsClass(keys.get(getattr(parent, self.parent_key), [])))
+
+        return parents
@@ -1,14 +1,26 @@
-import heapq
+import contextlib
+import copy
+import time
+from operator import attrgetter
 
 from .mixins import DataOperatorFuncs, AggregationFuncs
 from ..exceptions import BeeSQLError
 from ..aggregation import AggregationField
-from ..utils import Alias
+from ..utils import Alias, Column
+from ..rowfactory import TypeRowFactory, NamedTupleRowFactory
+from ..prefetch import Prefetch
+from ..scan import ParallelScan
+from ..sample import Sample
+from ..hedge import hedged_execute
+from ..materialize import MaterializedResult
 from .decorators import primary_keyword, secondary_keyword, logical_operator, complete_condition
 from .decorators import aggregation
+from .serialize import statement_to_dict, statement_from_dict, fingerprint
 
 
 class LogicalOperator(object):
+    __slots__ = ('statement', 'data_operator')
+
     def __init__(self, statement, data_operator):
         self.statement = statement
         self.data_operator = data_operator
@@ -21,14 +33,18 @@ class LogicalOperator(object):
 
 
 class LogicalAND(LogicalOperator):
+    __slots__ = ()
     KEYWORD = 'AND'
 
 
 class LogicalOR(LogicalOperator):
+    __slots__ = ()
     KEYWORD = 'OR'
 
 
 class DataOperator(object):
+    __slots__ = ('statement', 'column', 'value')
+
     def __init__(self, statement, column, value):
         self.statement = statement
         self.column = column
@@ -37,6 +53,18 @@ class DataOperator(object):
     def set_column(self, column_name):
         self.column = column_name
 
+    def format_value(self, value):
+        if isinstance(value, Statement):
+            return '({})'.format(value.get_sql())
+
+        if isinstance(value, Column):
+            return value.name
+
+        if isinstance(value, int):
+            return str(value)
+
+        return "'{}'".format(self.statement.query.db.escape(value))
+
     def get_sql(self):
         return '{} {} {}'.format(self.column, self.get_operator(), self.get_value())
 
@@ -45,56 +73,106 @@ class DataOperator(object):
 
 
 class EqualOperator(DataOperatorFuncs, DataOperator):
+    __slots__ = ()
     OPERATOR = '='
 
 
 class NotEqualOperator(DataOperatorFuncs, DataOperator):
+    __slots__ = ()
     OPERATOR = '<>'
 
 
 class InOperator(DataOperatorFuncs, DataOperator):
+    __slots__ = ()
     OPERATOR = 'IN'
 
-    def _filter(self, value):
-        if isinstance(value, int):
-            return str(value)
-
-        return "'{}'".format(self.statement.query.db.escape(value))
-
     def get_value(self):
-        return '({})'.format(', '.join(map(self._filter, self.value)))
+        if len(self.value) == 1 and isinstance(self.value[0], Statement):
+            return self.format_value(self.value[0])
+
+        return '({})'.format(', '.join(map(self.format_value, self.value)))
 
 
 class NotInOperator(DataOperatorFuncs, DataOperator):
+    __slots__ = ()
     OPERATOR = 'NOT IN'
 
-    def _filter(self, value):
-        if isinstance(value, int):
-            return str(value)
+    def get_value(self):
+        if len(self.value) == 1 and isinstance(self.value[0], Statement):
+            return self.format_value(self.value[0])
 
-        return "'{}'".format(self.statement.query.db.escape(value))
+        return '({})'.format(', '.join(map(self.format_value, self.value)))
+
+
+class KeyRangesOperator(DataOperator):
+    """ Column within any of the half-open ranges [low, high) in value. """
+    __slots__ = ()
+
+    def get_sql(self):
+        ranges = ['{0} >= {1} AND {0} < {2}'.format(self.column, self.format_value(low), self.format_value(high))
+                  for low, high in self.value]
+        return '({})'.format(' OR '.join(ranges))
+
+
+class NotNullOperator(DataOperator):
+    __slots__ = ()
+
+    def get_sql(self):
+        return '{} IS NOT NULL'.format(self.column)
+
+
+class ConditionGroup(DataOperator):
+    """ A data operator and its logical operators rendered in parentheses. """
+    __slots__ = ('logical_operators',)
+
+    def __init__(self, statement, data_operator, logical_operators):
+        super().__init__(statement, None, data_operator)
+        self.logical_operators = logical_operators
+
+    def get_sql(self):
+        sql = self.value.get_sql()
+        for lop in self.logical_operators:
+            sql = '{} {}'.format(sql, lop.get_sql())
+
+        return '({})'.format(sql)
 
-    def get_value(self):
-        return '({})'.format(', '.join(map(self._filter, self.value)))
+
+class ExistsOperator(DataOperator):
+    __slots__ = ()
+    OPERATOR = 'EXISTS'
+
+    def get_sql(self):
+        return '{} {}'.format(self.OPERATOR, self.format_value(self.value))
+
+
+class NotExistsOperator(ExistsOperator):
+    __slots__ = ()
+    OPERATOR = 'NOT EXISTS'
 
 
 class LessThanOperator(DataOperatorFuncs, DataOperator):
+    __slots__ = ()
     OPERATOR = '<'
 
 
 class LessThanOrEqualOperator(DataOperatorFuncs, DataOperator):
+    __slots__ = ()
     OPERATOR = '<='
 
 
 class GreaterThanOperator(DataOperatorFuncs, DataOperator):
+    __slots__ = ()
     OPERATOR = '>'
 
 
 class GreaterThanOrEqualOperator(DataOperatorFuncs, DataOperator):
+    __slots__ = ()
     OPERATOR = '>='
 
 
 class Keyword(object):
+    __slots__ = ('statement',)
+
     def __init__(self, statement):
         self.statement = statement
 
@@ -103,6 +181,8 @@ class Keyword(object):
 
 
 class Condition(Keyword):
+    __slots__ = ('data_operator', 'logical_operators', 'active')
+
     def __init__(self, statement, data_operator, logical_operators=None):
         super().__init__(statement)
         self.data_operator = data_operator
@@ -156,9 +236,6 @@ class StatementWithCondition(object):
 
     @logical_operator
     def _and(self, column_name=None, **kwargs):
-        LogicalANDClass = self.query.get_query_maker().make('logical_and')
-        EqualOperatorClass = self.query.get_query_maker().make('equal_operator')
-
         if column_name is None and not kwargs:
             raise BeeSQLError('and operator can\'t be empty')
 
@@ -166,6 +243,8 @@ class StatementWithCondition(object):
             selector = ANDColumnSelector(self, column_name)
             return selector
         else:
+            LogicalANDClass = self.query.make('logical_and')
+            EqualOperatorClass = self.query.make('equal_operator')
             data_ops = [EqualOperatorClass(self, key, val) for key, val in kwargs.items()]
             logical_ops = [LogicalANDClass(self, dop) for dop in data_ops]
             self.chain_condition(logical_ops)
@@ -174,10 +253,6 @@ class StatementWithCondition(object):
 
     @logical_operator
     def _or(self, column_name=None, **kwargs):
-        LogicalANDClass = self.query.get_query_maker().make('logical_and')
-        LogicalORClass = self.query.get_query_maker().make('logical_or')
-        EqualOperatorClass = self.query.get_query_maker().make('equal_operator')
-
         if column_name is None and not kwargs:
             raise BeeSQLError('and operator can\'t be empty')
 
@@ -185,6 +260,9 @@ class StatementWithCondition(object):
             selector = ORColumnSelector(self, column_name)
             return selector
         else:
+            LogicalANDClass = self.query.make('logical_and')
+            LogicalORClass = self.query.make('logical_or')
+            EqualOperatorClass = self.query.make('equal_operator')
             data_ops = [EqualOperatorClass(self, key, val) for key, val in kwargs.items()]
             first_data_op = data_ops.pop(0)
             logical_ops = [LogicalANDClass(self, dop) for dop in data_ops]
@@ -196,10 +274,6 @@ class StatementWithCondition(object):
 
 class WhereFuncMixin(object):
     def where(self, column_name=None, **kwargs):
-        LogicalANDClass = self.query.get_query_maker().make('logical_and')
-        EqualOperatorClass = self.query.get_query_maker().make('equal_operator')
-        WhereClass = self.query.get_query_maker().make('where')
-
         if column_name is None and not kwargs:
             raise BeeSQLError('where statement can\'t be empty')
 
@@ -211,6 +285,9 @@ class WhereFuncMixin(object):
 
             return selector
         else:
+            LogicalANDClass = self.query.make('logical_and')
+            EqualOperatorClass = self.query.make('equal_operator')
+            WhereClass = self.query.make('where')
             data_ops = [EqualOperatorClass(self, key, val) for key, val in kwargs.items()]
             data_op = data_ops.pop(0)
             logical_ops = [LogicalANDClass(self, dop) for dop in data_ops]
@@ -220,13 +297,101 @@ class WhereFuncMixin(object):
 
             return self
 
+    def _where_operator(self, data_operator):
+        if self.is_condition_set():
+            self.chain_condition([self.query.make('logical_and')(self, data_operator)])
+        else:
+            where_keyword = self.query.make('where')(self, data_operator)
+            self.set_active_condition(where_keyword)
+            self.add_secondary_keyword(where_keyword)
+
+        return self
+
+    def restrict(self, *data_operators):
+        """ AND data operators onto the WHERE condition, grouping an existing OR condition first. """
+        if not data_operators:
+            raise BeeSQLError('restrict expects one or more data operators')
+
+        LogicalANDClass = self.query.make('logical_and')
+        where = None
+        for kw in self.get_secondary_keywords():
+            if isinstance(kw, WhereCondition):
+                where = kw
+                break
+
+        data_operators = list(data_operators)
+        if where is None:
+            where = self.query.make('where')(self, data_operators.pop(0))
+            if not self.is_condition_set():
+                self.set_active_condition(where)
+            self.add_secondary_keyword(where)
+        elif any(isinstance(lop, LogicalOR) for lop in where.logical_operators):
+            GroupClass = self.query.make('condition_group')
+            where.data_operator = GroupClass(self, where.data_operator, where.logical_operators)
+            where.logical_operators = []
+
+        where.chain([LogicalANDClass(self, dop) for dop in data_operators])
+        return self
+
+    def has_where(self):
+        return any(isinstance(kw, WhereCondition) for kw in self.get_secondary_keywords())
+
+    def exists(self, statement):
+        """ Filter on EXISTS (statement). """
+        return self._where_operator(self.query.make('exists_operator')(self, None, statement))
+
+    def not_exists(self, statement):
+        """ Filter on NOT EXISTS (statement). """
+        return self._where_operator(self.query.make('not_exists_operator')(self, None, statement))
+
+
+class JoinFuncMixin(object):
+    @secondary_keyword
+    def join(self, *args, **kwargs):
+        JoinClass = self.query.make('join')
+        join_keyword = JoinClass(self, *args, **kwargs)
+        return join_keyword
+
+    @secondary_keyword
+    def inner_join(self, *args, **kwargs):
+        JoinClass = self.query.make('inner_join')
+        join_keyword = JoinClass(self, *args, **kwargs)
+        return join_keyword
+
+    @secondary_keyword
+    def left_join(self, *args, **kwargs):
+        JoinClass = self.query.make('left_join')
+        join_keyword = JoinClass(self, *args, **kwargs)
+        return join_keyword
+
+
+class OrderLimitFuncMixin(object):
+    @secondary_keyword
+    def order_by(self, *column_names):
+        if not column_names:
+            raise BeeSQLError('order_by expects one or more column names.')
+
+        columns_dict = {}
+        for col in column_names:
+            column_name = col[1:] if col.startswith('-') else col
+            order = 0 if col.startswith('-') else 1
+            columns_dict[column_name] = order
+
+        OrderByClass = self.query.make('order_by')
+        order_by_keyword = OrderByClass(self, **columns_dict)
+        return order_by_keyword
+
+    @secondary_keyword
+    def limit(self, limit, offset=0):
+        limit = int(limit)
+        offset = int(offset)
+        LimitClass = self.query.make('limit')
+        limit_keyword = LimitClass(self, limit, offset)
+        return limit_keyword
+
 
 class HavingFuncMixin(object):
     def having(self, column_name=None, **kwargs):
-        LogicalANDClass = self.query.get_query_maker().make('logical_and')
-        EqualOperatorClass = self.query.get_query_maker().make('equal_operator')
-        HavingClass = self.query.get_query_maker().make('having')
-
         if column_name is None and not kwargs:
             raise BeeSQLError('having statement can\'t be empty')
 
@@ -234,6 +399,9 @@ class HavingFuncMixin(object):
             selector = HavingColumnSelector(self, column_name)
             return selector
         else:
+            LogicalANDClass = self.query.make('logical_and')
+            EqualOperatorClass = self.query.make('equal_operator')
+            HavingClass = self.query.make('having')
             data_ops = [EqualOperatorClass(self, key, val) for key, val in kwargs.items()]
             data_op = data_ops.pop(0)
             logical_ops = [LogicalANDClass(self, dop) for dop in data_ops]
@@ -244,40 +412,126 @@ class HavingFuncMixin(object):
         return self
 
 
+class Hint(object):
+    """ Optimizer directive. Generic SQL has none, so hints render empty unless a dialect renders them. """
+    __slots__ = ('statement',)
+
+    def __init__(self, statement):
+        self.statement = statement
+
+    def get_sql(self):
+        return ''
+
+    def __repr__(self):
+        return '{}: {}'.format(self.__class__, self.get_sql())
+
+
+class IndexHint(Hint):
+    """ USE, FORCE or IGNORE INDEX hint on a table. """
+    __slots__ = ('action', 'indexes')
+
+    def __init__(self, statement, action, *indexes):
+        if not indexes:
+            raise BeeSQLError('Index hints expect one or more index names')
+
+        super().__init__(statement)
+        self.action = action
+        self.indexes = indexes
+
+
+class OptimizerHints(Hint):
+    """ Optimizer hints rendered as a single hint comment after SELECT. """
+    __slots__ = ('hints',)
+
+    def __init__(self, statement, hints):
+        super().__init__(statement)
+        self.hints = hints
+
+
+class SelectModifier(Hint):
+    """ Modifier placed between SELECT and the field list, such as SQL_NO_CACHE. """
+    __slots__ = ('modifier',)
+
+    def __init__(self, statement, modifier):
+        super().__init__(statement)
+        self.modifier = modifier
+
+
 class Join(Keyword):
+    __slots__ = ('tables', 'conditions', 'index_hints')
     KEYWORD_PRIORITY = 1
+    JOIN_TYPE = 'JOIN'
 
     def __init__(self, statement, *args, **kwargs):
         super().__init__(statement)
         tables = []
         for arg in args:
             if isinstance(arg, Alias):
-                tables.append('{} AS {}'.format(arg.name, arg.alias))
+                if isinstance(arg.name, Statement):
+                    tables.append(arg)
+                else:
+                    tables.append('{} AS {}'.format(arg.name, arg.alias))
             if isinstance(arg, str):
                 parts = arg.split('__')
                 table_name = '{} AS {}'.format(parts[0], parts[1]) if len(parts) == 2 else parts[0]
                 tables.append(table_name)
+            if isinstance(arg, Statement):
+                raise BeeSQLError('Derived tables require an alias. Use alias(statement, name)')
 
         self.tables = tables
         self.conditions = {key.replace('__', '.'): val.replace('__', '.') for key, val in kwargs.items()}
+        self.index_hints = []
+
+    def _table_sql(self, table):
+        if isinstance(table, Alias):
+            return '({}) AS {}'.format(table.name.get_sql(), table.alias)
+
+        return table
+
+    def has_table(self, table_name):
+        for table in self.tables:
+            names = [table.alias] if isinstance(table, Alias) else table.split(' AS ')
+            if table_name in names:
+                return True
+
+        return False
+
+    def add_index_hint(self, index_hint):
+        if len(self.tables) != 1:
+            raise BeeSQLError('Index hints are only supported on single table joins')
+
+        self.index_hints.append(index_hint)
 
     def get_sql(self):
-        tables = self.tables
+        tables = [self._table_sql(table) for table in self.tables]
         if len(tables) == 1:
-            sql = 'JOIN {}'.format(tables[0])
+            hints = [hint.get_sql() for hint in self.index_hints]
+            sql = ' '.join(filter(None, [self.JOIN_TYPE, tables[0]] + hints))
         else:
-            sql = 'JOIN ({})'.format(', '.join(tables))
+            sql = '{} ({})'.format(self.JOIN_TYPE, ', '.join(tables))
 
         sql = '{} ON {}'.format(sql, ' AND '.join(['{} = {}'.format(k, v) for k, v in self.conditions.items()]))
         return sql
 
 
+class InnerJoin(Join):
+    __slots__ = ()
+    JOIN_TYPE = 'INNER JOIN'
+
+
+class LeftJoin(Join):
+    __slots__ = ()
+    JOIN_TYPE = 'LEFT JOIN'
+
+
 class WhereCondition(Condition):
+    __slots__ = ()
     KEYWORD_PRIORITY = 2
     CLAUSE = 'WHERE'
 
 
 class GroupBy(Keyword):
+    __slots__ = ('columns',)
     KEYWORD_PRIORITY = 3
 
     def __init__(self, statement, *column_names):
@@ -293,11 +547,13 @@ class GroupBy(Keyword):
 
 
 class HavingCondition(Condition):
+    __slots__ = ()
     KEYWORD_PRIORITY = 4
     CLAUSE = 'HAVING'
 
 
 class OrderBy(Keyword):
+    __slots__ = ('columns',)
     KEYWORD_PRIORITY = 5
 
     def __init__(self, statement, **column_names):
@@ -310,6 +566,7 @@ class OrderBy(Keyword):
 
 
 class Limit(Keyword):
+    __slots__ = ('limit', 'offset')
     KEYWORD_PRIORITY = 6
 
     def __init__(self, statement, limit, offset=0):
@@ -323,6 +580,8 @@ class Limit(Keyword):
 
 
 class Aggregation(object):
+    __slots__ = ('column_name', 'as_name')
+
     def __init__(self, column_name, as_name=None):
         self.column_name = column_name
         self.as_name = as_name
@@ -333,30 +592,52 @@ class Aggregation(object):
 
 
 class CountAggregation(AggregationFuncs, Aggregation):
+    __slots__ = ()
     FUNCTION_NAME = 'COUNT'
 
 
 class SumAggregation(AggregationFuncs, Aggregation):
+    __slots__ = ()
     FUNCTION_NAME = 'SUM'
 
 
+class CountSumAggregation(AggregationFuncs, Aggregation):
+    """ Sum of partial counts, 0 rather than NULL over no rows like COUNT. """
+    __slots__ = ()
+    FUNCTION_NAME = 'SUM'
+
+    def _get_sql(self):
+        return 'COALESCE({}({}), 0) AS {}'.format(self.FUNCTION_NAME, self.column_name, self.result_name())
+
+
 class AvgAggregation(AggregationFuncs, Aggregation):
+    __slots__ = ()
     FUNCTION_NAME = 'AVG'
 
 
 class MaxAggregation(AggregationFuncs, Aggregation):
+    __slots__ = ()
     FUNCTION_NAME = 'MAX'
 
 
 class MinAggregation(AggregationFuncs, Aggregation):
+    __slots__ = ()
     FUNCTION_NAME = 'MIN'
 
 
 class Statement(object):
+    # read only statements can share results of identical concurrent executions
+    COALESCE = False
+    # statements the DB cost guard explains before running them
+    GUARDED = True
 
     def __init__(self, query, **kwargs):
         self.query = query
         self.secondary_keywords = []
+        self.row_factory = None
+        self.cache_results = False
+        self.cache_ttl = None
+        self.priority = None
 
     def __repr__(self):
         return '{}: {}'.format(self.__class__, self.get_sql())
@@ -372,23 +653,190 @@ class Statement(object):
     def add_secondary_keyword(self, keyword):
         self.secondary_keywords.append(keyword)
 
+    def to_dict(self):
+        """ Plain data representation of the statement and its keywords, without the DB.
+
+        The result can be pickled or dumped as JSON and turned back into a statement with from_dict.
+        """
+        return statement_to_dict(self)
+
+    @classmethod
+    def from_dict(cls, db, data):
+        """ Rebuild a statement from to_dict data, on a query of db. """
+        return statement_from_dict(db, data)
+
+    def fingerprint(self):
+        """ Stable hash of the statement structure and values. """
+        return fingerprint(self.to_dict())
+
+    def explain(self):
+        """ Explain statement of this statement, its rows describe the execution plan. """
+        return self.query.make('explain')(self.query, self)
+
+    def copy(self):
+        """ Deep copy of the statement and its keywords, sharing the same DB. """
+        db = self.query.db
+        return copy.deepcopy(self, {id(db): db})
+
+    def as_type(self, row_type):
+        """ Return result rows as row_type instances, constructed with one keyword argument per column. """
+        self.row_factory = TypeRowFactory(row_type)
+        return self
+
+    def as_namedtuple(self):
+        """ Return result rows as namedtuples. """
+        self.row_factory = NamedTupleRowFactory()
+        return self
+
+    def cached(self, ttl=None):
+        """ Share the result of this statement through the DB result cache, for ttl seconds or the cache ttl. """
+        if not self.COALESCE:
+            raise BeeSQLError('Only read only statements can be cached')
+
+        self.cache_results = True
+        self.cache_ttl = ttl
+        return self
+
+    def prioritize(self, priority):
+        """ Run with priority, interactive or batch, when the DB has a scheduler. Defaults to DB.priority. """
+        self.priority = priority
+        return self
+
+    def _result_cache(self):
+        db = self.query.db
+        cache = getattr(db, 'result_cache', None)
+        if self.cache_results and cache is None:
+            raise BeeSQLError('No result cache set on {}'.format(db))
+
+        if self.cache_results or (self.COALESCE and getattr(db, 'cache_all', False)):
+            return cache
+
+    def _table_sql(self):
+        if self.query.table_alias:
+            return '{} AS {}'.format(self.query.table, self.query.table_alias)
+
+        return self.query.table
+
     def get_secondary_keywords(self, ordered=False):
         if not ordered:
             return self.secondary_keywords
 
-        ordered = []
-        kws = self.secondary_keywords[:]
-        heapq.heapify(kws)
+        return sorted(self.secondary_keywords, key=attrgetter('KEYWORD_PRIORITY'))
 
-        while kws:
-            ordered.insert(0, heapq.heappop(kws))
+    def execute(self, timeout=None, hedge_after_ms=None):
+        """ Run the statement. It is cancelled with QueryTimeoutError after timeout seconds,
+        which defaults to DB.timeout.
 
-        return ordered
+        With hedge_after_ms, a read only statement that has not answered after that many milliseconds is
+        run again on a second connection, within the DB hedge budget. The first answer wins and the other
+        run is killed.
+        """
+        if timeout is None:
+            timeout = self.query.db.timeout
 
-    def execute(self):
-        res = None
-        with self.query.db.connect() as conn:
-            res = conn.execute(self)
+        if hedge_after_ms is not None and not self.COALESCE:
+            raise BeeSQLError('Only read only statements can be hedged')
+
+        singleflight = self.query.db.singleflight
+        if singleflight is not None and self.COALESCE:
+            return singleflight.do(self.result_key(), lambda: self._run(timeout, hedge_after_ms))
+
+        return self._run(timeout, hedge_after_ms)
+
+    async def execute_async(self, timeout=None, hedge_after_ms=None):
+        """ Run the statement in the event loop's default executor. """
+        # imported here to keep asyncio out of import beesql, it is already loaded inside a running loop
+        import asyncio
+
+        if timeout is None:
+            timeout = self.query.db.timeout
+
+        if hedge_after_ms is not None and not self.COALESCE:
+            raise BeeSQLError('Only read only statements can be hedged')
+
+        singleflight = self.query.db.singleflight
+        if singleflight is not None and self.COALESCE:
+            return await singleflight.do_async(self.result_key(), lambda: self._run(timeout, hedge_after_ms))
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._run, timeout, hedge_after_ms)
+
+    def result_key(self):
+        """ Identifies statements producing the same result: their sql and how rows are built. """
+        row_factory_key = self.row_factory.key() if self.row_factory else None
+        prefetch_keys = tuple(p.key() for p in getattr(self, 'prefetches', []))
+        sampling = getattr(self, 'sampling', None)
+        sample_key = sampling.key() if sampling else None
+        return (self.query.db.db_name, self.get_sql(), row_factory_key, prefetch_keys, sample_key)
+
+    def _run(self, timeout, hedge_after_ms=None):
+        cache = self._result_cache()
+        if cache is not None:
+            key = cache.key(self)
+            res = cache.get(key)
+            if res is not None:
+                return res
+
+        db = self.query.db
+        with self._slot(timeout) as timeout:
+            if hedge_after_ms is not None:
+                res = hedged_execute(self, timeout, hedge_after_ms / 1000.0, db.hedge_budget, db.scheduler,
+                                     self.priority or db.priority)
+            else:
+                with db.connect() as conn:
+                    res = self._execute(conn, timeout=timeout)
+
+        if cache is not None:
+            cache.put(key, res, self.cache_ttl)
+
+        return res
+
+    @contextlib.contextmanager
+    def _slot(self, timeout):
+        """ Hold a DB scheduler slot, if any, while the block runs. Yields what is left of timeout. """
+        db = self.query.db
+        priority = self.priority or db.priority
+        if db.scheduler is not None:
+            waited = db.scheduler.acquire(priority, deadline=timeout)
+            if timeout:
+                # time spent queued counts against the timeout
+                timeout = max(timeout - waited, 0.001)
+
+        start = time.monotonic()
+        try:
+            yield timeout
+        finally:
+            if db.scheduler is not None:
+                db.scheduler.release(priority, time.monotonic() - start)
+
+    def _check_cost(self, conn, timeout):
+        """ Run the DB cost guard, if any, on this statement. Returns what is left of timeout. """
+        guard = getattr(self.query.db, 'guard', None)
+        if guard is None or not self.GUARDED:
+            return timeout
+
+        start = time.monotonic()
+        guard.check(self, conn, timeout=timeout)
+        return max(timeout - (time.monotonic() - start), 0.001) if timeout else timeout
+
+    def _execute(self, conn, **kwargs):
+        kwargs['timeout'] = self._check_cost(conn, kwargs.get('timeout'))
+        return conn.execute(self, **kwargs)
+
+    def export(self, target, format='csv', batch_size=1000, compress=False, timeout=None):
+        """ Stream the statement results into a path or file object as csv or jsonl.
+
+        Like execute(), the export is cancelled with QueryTimeoutError after timeout seconds, which
+        defaults to DB.timeout. Returns an ExportResult with the number of rows and bytes written.
+        """
+        if timeout is None:
+            timeout = self.query.db.timeout
+
+        with self._slot(timeout) as timeout:
+            with self.query.db.connect() as conn:
+                timeout = self._check_cost(conn, timeout)
+                res = conn.export(self, target, format=format, batch_size=batch_size, compress=compress,
+                                  timeout=timeout)
 
         return res
 
@@ -400,100 +848,215 @@ class Statement(object):
         return sql
 
 
-class Select(WhereFuncMixin, HavingFuncMixin, StatementWithCondition, Statement):
+class Select(WhereFuncMixin, JoinFuncMixin, HavingFuncMixin, OrderLimitFuncMixin, StatementWithCondition,
+             Statement):
+    COALESCE = True
 
     def __init__(self, query, aggregations=None, *args):
         super().__init__(query)
         self.aggregations = aggregations or []
-        fields = filter(lambda x: isinstance(x, str), args)
-        alias_fields = filter(lambda x: isinstance(x, Alias), args)
-        alias_fields = map(self._field_from_alias, alias_fields)
-        fields_set = set(fields)
-        fields_set.update(alias_fields)
-        self.fields = list(fields_set)
+        self.fields = []
+        self.index_hints = []
+        self.optimizer_hints = []
+        self.modifiers = []
+        self.prefetches = []
+        self.sampling = None
+        self._add_fields(args)
 
     def _field_from_alias(self, alias):
         return '{} AS {}'.format(alias.name, alias.alias)
 
+    def _add_fields(self, args):
+        """ Add str, Alias and AggregationField arguments in one pass, skipping duplicate fields. """
+        fields = self.fields
+        for arg in args:
+            if isinstance(arg, str):
+                field = arg
+            elif isinstance(arg, Alias):
+                field = self._field_from_alias(arg)
+            elif isinstance(arg, AggregationField):
+                self.add_aggregation(self.query.make(arg.QUERY_PART_NAME)(arg.column_name, arg.as_name))
+                continue
+            else:
+                continue
+
+            if field not in fields:
+                fields.append(field)
+
     def select(self, *args):
-        q_maker = self.query.get_query_maker()
-        fields = filter(lambda x: isinstance(x, str), args)
-        alias_fields = filter(lambda x: isinstance(x, Alias), args)
-        alias_fields = map(self._field_from_alias, alias_fields)
+        self._add_fields(args)
+        return self
+
+    def _index_hint(self, action, indexes, table):
+        index_hint = self.query.make('index_hint')(self, action, *indexes)
+        if table is None or table in (self.query.table, self.query.table_alias):
+            self.index_hints.append(index_hint)
+            return self
+
+        for kw in self.get_secondary_keywords():
+            if isinstance(kw, Join) and kw.has_table(table):
+                kw.add_index_hint(index_hint)
+                return self
+
+        raise BeeSQLError('No table named {} in statement'.format(table))
+
+    def use_index(self, *indexes, table=None):
+        """ Hint the indexes to use on the main table, or on a joined table. """
+        return self._index_hint('USE', indexes, table)
 
-        fields_set = set(self.fields)
-        fields_set.update(fields)
-        fields_set.update(alias_fields)
-        self.fields = list(fields_set)
+    def force_index(self, *indexes, table=None):
+        return self._index_hint('FORCE', indexes, table)
 
-        agg_fields = filter(lambda x: isinstance(x, AggregationField), args)
-        aggregation_queries = [q_maker.make(agg.QUERY_PART_NAME)(agg.column_name, agg.as_name) for agg in agg_fields]
-        for agg_query in aggregation_queries:
-            self.add_aggregation(agg_query)
+    def ignore_index(self, *indexes, table=None):
+        return self._index_hint('IGNORE', indexes, table)
 
+    def optimizer_hint(self, hint):
+        """ Add an optimizer hint such as 'NO_RANGE_OPTIMIZATION(t1 PRIMARY)'. """
+        self.optimizer_hints.append(hint)
         return self
 
-    @secondary_keyword
-    def join(self, *args, **kwargs):
-        JoinClass = self.query.get_query_maker().make('join')
-        join_keyword = JoinClass(self, *args, **kwargs)
-        return join_keyword
+    def max_execution_time(self, milliseconds):
+        return self.optimizer_hint('MAX_EXECUTION_TIME({})'.format(int(milliseconds)))
+
+    def _modifier(self, modifier):
+        if not any(m.modifier == modifier for m in self.modifiers):
+            self.modifiers.append(self.query.make('select_modifier')(self, modifier))
+
+        return self
+
+    def prefetch(self, table, on, as_=None, columns=None, chunk_size=1000):
+        """ Load rows of table related through on=(parent column, child column) after this select runs.
+
+        Each result row gets a Rows of its children under as_ (the table name by default), loaded with
+        one IN query per chunk_size parent keys on the same connection.
+        """
+        self.prefetches.append(Prefetch(table, on, as_, columns, chunk_size))
+        return self
+
+    def sample(self, fraction=None, rows=None, seed=None, by='id', blocks=100):
+        """ Read a random part of the rows, fraction of them or about rows of them, instead of all of them.
+
+        The sample is taken from blocks key ranges of the integer column by. COUNT and SUM aggregations are
+        scaled up to estimates for all rows, AVG is kept, and each gets a <name>_error standard error.
+        The returned Rows have a sample attribute with the fraction of keys read.
+        """
+        self.sampling = Sample(by, fraction=fraction, rows=rows, seed=seed, blocks=blocks)
+        return self
+
+    def _filter_copy(self):
+        """ Copy keeping only the tables and WHERE conditions, selecting nothing. """
+        statement = self.copy()
+        statement.fields = []
+        statement.aggregations = []
+        statement.prefetches = []
+        statement.sampling = None
+        statement.row_factory = None
+        statement.secondary_keywords = [kw for kw in statement.secondary_keywords
+                                        if isinstance(kw, (Join, WhereCondition))]
+        return statement
+
+    def key_range(self, column, timeout=None):
+        """ MIN and MAX of column over the rows this select matches. """
+        statement = self._filter_copy()
+        row = statement.min(column, 'range_low').max(column, 'range_high').execute(timeout=timeout)[0]
+        return row.range_low, row.range_high
+
+    def estimate_count(self, timeout=None):
+        """ Estimated number of rows this select matches, from table statistics. """
+        statement = self._filter_copy()
+        count = statement.query.make('count')(statement.query, approximate=True)
+        count.secondary_keywords = statement.secondary_keywords
+        return count.execute(timeout=timeout)[0].count
+
+    def parallel_scan(self, by='id', workers=4, executor='thread', chunks=None, callback=None,
+                      checkpoint=None, timeout=None):
+        """ Scan the statement results in key ranges of column by, running workers ranges concurrently.
+
+        MIN/MAX of by are split into chunks balanced ranges (workers * 4 by default). Returns an iterator
+        of ScanChunk(low, high, result) in completion order, where result is the chunk Rows or the value
+        callback returned for them in the worker. Completed chunks are recorded in the checkpoint file,
+        if given, and skipped when the scan is started again with the same file.
+        """
+        return iter(ParallelScan(self, by, workers=workers, executor=executor, chunks=chunks,
+                                 callback=callback, checkpoint=checkpoint, timeout=timeout))
+
+    def materialize(self, key='id', watermark='updated_at', reconcile_interval=None, timeout=None):
+        """ Run the select into an in-memory result keyed by key, kept current with refresh().
+
+        refresh() only fetches rows whose watermark column reached the highest value seen, and runs the
+        full select again every reconcile_interval seconds to drop deleted rows.
+        """
+        result = MaterializedResult(self, key=key, watermark=watermark, reconcile_interval=reconcile_interval,
+                                    timeout=timeout)
+        result.refresh()
+        return result
+
+    def _execute(self, conn, **kwargs):
+        if self.sampling is not None:
+            return self.sampling.execute(self, conn, **kwargs)
+
+        routed = self.query.db.route(self)
+        if routed is not None:
+            return routed._execute(conn, **kwargs)
+
+        rows = super()._execute(conn, **kwargs)
+        for prefetch in self.prefetches:
+            prefetch.fetch(self.query.db, conn, rows, **kwargs)
+
+        return rows
+
+    def straight_join(self):
+        """ Join tables in the order they are listed. """
+        return self._modifier('STRAIGHT_JOIN')
+
+    def no_cache(self):
+        return self._modifier('SQL_NO_CACHE')
 
     @secondary_keyword
     def group_by(self, *column_names):
         if not column_names:
             raise BeeSQLError('group_by expects one or more column names.')
 
-        GroupByClass = self.query.get_query_maker().make('group_by')
+        GroupByClass = self.query.make('group_by')
         group_by = GroupByClass(self, *column_names)
         return group_by
 
-    @secondary_keyword
-    def order_by(self, *column_names):
-        if not column_names:
-            raise BeeSQLError('order_by expects one or more column names.')
+    def union_all(self, *selects):
+        """ UNION ALL of this select and selects, as a new statement of the query. """
+        return self._union().union_all(*selects)
 
-        columns_dict = {}
-        for col in column_names:
-            column_name = col[1:] if col.startswith('-') else col
-            order = 0 if col.startswith('-') else 1
-            columns_dict[column_name] = order
+    def union(self, *selects):
+        """ UNION of this select and selects, removing duplicate rows, as a new statement of the query. """
+        return self._union().union(*selects)
 
-        OrderByClass = self.query.get_query_maker().make('order_by')
-        order_by_keyword = OrderByClass(self, **columns_dict)
-        return order_by_keyword
-
-    @secondary_keyword
-    def limit(self, limit, offset=0):
-        limit = int(limit)
-        offset = int(offset)
-        LimitClass = self.query.get_query_maker().make('limit')
-        limit_keyword = LimitClass(self, limit, offset)
-        return limit_keyword
+    def _union(self):
+        union = self.query.make('union')(self.query, self)
+        self.query.set_statement(union)
+        return union
 
     @aggregation
     def sum(self, column_name, as_name=None):
-        AggregationClass = self.query.get_query_maker().make('sum_aggregation')
+        AggregationClass = self.query.make('sum_aggregation')
         return AggregationClass(column_name, as_name)
 
     @aggregation
     def avg(self, column_name, as_name=None):
-        AggregationClass = self.query.get_query_maker().make('avg_aggregation')
+        AggregationClass = self.query.make('avg_aggregation')
         return AggregationClass(column_name, as_name)
 
     @aggregation
     def count(self, column_name, as_name=None):
-        AggregationClass = self.query.get_query_maker().make('count_aggregation')
+        AggregationClass = self.query.make('count_aggregation')
         return AggregationClass(column_name, as_name)
 
     @aggregation
     def max(self, column_name, as_name=None):
-        AggregationClass = self.query.get_query_maker().make('max_aggregation')
+        AggregationClass = self.query.make('max_aggregation')
         return AggregationClass(column_name, as_name)
 
     @aggregation
     def min(self, column_name, as_name=None):
-        AggregationClass = self.query.get_query_maker().make('min_aggregation')
+        AggregationClass = self.query.make('min_aggregation')
         return AggregationClass(column_name, as_name)
 
     def add_aggregation(self, aggregation):
@@ -507,16 +1070,56 @@ class Select(WhereFuncMixin, HavingFuncMixin, StatementWithCondition, Statement)
             fields.extend([ag.get_sql() for ag in self.aggregations])
             fields = ', '.join(fields)
 
-        if self.query.table_alias:
-            table_name = '{} AS {}'.format(self.query.table, self.query.table_alias)
-        else:
-            table_name = self.query.table
+        select = ['SELECT']
+        if self.optimizer_hints:
+            select.append(self.query.make('optimizer_hints')(self, self.optimizer_hints).get_sql())
+        select.extend([m.get_sql() for m in self.modifiers])
+
+        table = [self._table_sql()]
+        table.extend([hint.get_sql() for hint in self.index_hints])
 
         params = {
+            'select': ' '.join(filter(None, select)),
             'fields': fields,
-            'table': table_name,
+            'table': ' '.join(filter(None, table)),
         }
-        sql = "SELECT {fields} FROM {table}".format(**params)
+        sql = "{select} {fields} FROM {table}".format(**params)
+        return sql
+
+
+class Union(OrderLimitFuncMixin, Statement):
+    """ Selects combined with UNION and UNION ALL. order_by and limit apply to the combined rows. """
+    COALESCE = True
+
+    def __init__(self, query, select):
+        super().__init__(query)
+        self.selects = [select]
+        self.operators = []
+
+    def _add(self, operator, selects):
+        if not selects:
+            raise BeeSQLError('{} expects one or more selects'.format(operator))
+
+        for select in selects:
+            if not isinstance(select, Select):
+                raise BeeSQLError('Expected instance of {}. Got instance of {}'.format(Select, select.__class__))
+
+            self.operators.append(operator)
+            self.selects.append(select)
+
+        return self
+
+    def union_all(self, *selects):
+        return self._add('UNION ALL', selects)
+
+    def union(self, *selects):
+        return self._add('UNION', selects)
+
+    def _get_sql(self):
+        sql = '({})'.format(self.selects[0].get_sql())
+        for operator, select in zip(self.operators, self.selects[1:]):
+            sql = '{} {} ({})'.format(sql, operator, select.get_sql())
+
         return sql
 
 
@@ -548,18 +1151,42 @@ class Update(WhereFuncMixin, StatementWithCondition, Statement):
         self.values.update(kwargs)
         return self
 
+    def allow_all_rows(self):
+        """ Allow running without a where condition, updating every row. """
+        self.prevent_update_all = False
+        return self
+
+    def _execute(self, conn, **kwargs):
+        if self.prevent_update_all and not self.has_where():
+            raise BeeSQLError('Update of every row of {}. Use allow_all_rows() if intended'.format(self.query.table))
+
+        return super()._execute(conn, **kwargs)
+
 
 class Delete(WhereFuncMixin, StatementWithCondition, Statement):
     def __init__(self, query, prevent_delete_all=True):
         super().__init__(query)
         self.prevent_delete_all = prevent_delete_all
 
+    def allow_all_rows(self):
+        """ Allow running without a where condition, deleting every row. """
+        self.prevent_delete_all = False
+        return self
+
+    def _execute(self, conn, **kwargs):
+        if self.prevent_delete_all and not self.has_where():
+            raise BeeSQLError('Delete of every row of {}. Use allow_all_rows() if intended'.format(self.query.table))
+
+        return super()._execute(conn, **kwargs)
+
     def _get_sql(self):
         sql = "DELETE FROM {}".format(self.query.table)
         return sql
 
 
 class Insert(Statement):
+    GUARDED = False
+
     def __init__(self, query, *args):
         super().__init__(query)
         self.fields = args
@@ -588,22 +1215,64 @@ class Insert(Statement):
         return sql
 
 
-class Count(StatementWithCondition, Statement):
-    def __init__(self, query):
+class Count(WhereFuncMixin, JoinFuncMixin, StatementWithCondition, Statement):
+    COALESCE = True
+
+    def __init__(self, query, column_name=None, distinct=False, approximate=False):
+        if distinct and column_name is None:
+            raise BeeSQLError('Count distinct expects a column name')
+
+        if approximate and column_name is not None:
+            raise BeeSQLError('Approximate counts estimate rows, not values of a column')
+
+        super().__init__(query)
+        self.column_name = column_name
+        self.distinct = distinct
+        self.approximate = approximate
+
+    def result_key(self):
+        return super().result_key() + (self.approximate,)
+
+    def _execute(self, conn, **kwargs):
+        if self.approximate:
+            return conn.approximate_count(self, **kwargs)
+
+        return super()._execute(conn, **kwargs)
+
+    def _get_sql(self):
+        if self.column_name is None:
+            counted = '*'
+        elif self.distinct:
+            counted = 'DISTINCT {}'.format(self.column_name)
+        else:
+            counted = self.column_name
+
+        sql = "SELECT count({}) AS count FROM {}".format(counted, self._table_sql())
+        return sql
+
+
+class Explain(Statement):
+    """ EXPLAIN of another statement, returning one row per step of its execution plan. """
+    GUARDED = False
+
+    def __init__(self, query, explained):
         super().__init__(query)
+        self.explained = explained
 
     def _get_sql(self):
-        sql = "SELECT count(*) AS count FROM {}".format(self.query.table)
+        sql = "EXPLAIN {}".format(self.explained.get_sql())
         return sql
 
 
 class ColumnSelector(object):
+    __slots__ = ('statement', 'column_name')
+
     def __init__(self, statement, column_name):
         self.statement = statement
         self.column_name = column_name
 
     def get_operator(self, query_operator_name, value):
-        OperatorClass = self.statement.query.get_query_maker().make(query_operator_name)
+        OperatorClass = self.statement.query.make(query_operator_name)
         op = OperatorClass(self.statement, self.column_name, value)
         return op
 
@@ -636,7 +1305,7 @@ class ColumnSelector(object):
             raise BeeSQLError('No arguments provided for in operator')
 
         value = args[:]
-        InOperatorClass = self.statement.query.get_query_maker().make('in_operator')
+        InOperatorClass = self.statement.query.make('in_operator')
         op = InOperatorClass(self.statement, self.column_name, value)
         return self.complete(op)
 
@@ -645,7 +1314,7 @@ class ColumnSelector(object):
             raise BeeSQLError('No arguments provided for in operator')
 
         value = args[:]
-        NotInOperatorClass = self.statement.query.get_query_maker().make('not_in_operator')
+        NotInOperatorClass = self.statement.query.make('not_in_operator')
         op = NotInOperatorClass(self.statement, self.column_name, value)
         return self.complete(op)
 
@@ -654,8 +1323,10 @@ class ColumnSelector(object):
 
 
 class ConditionalColumnSelector(ColumnSelector):
+    __slots__ = ()
+
     def complete(self, data_operator):
-        condition_class = self.statement.query.get_query_maker().make(self.CONDITION_QUERY_PART)
+        condition_class = self.statement.query.make(self.CONDITION_QUERY_PART)
         condition = condition_class(self.statement, data_operator)
         self.statement.set_active_condition(condition)
         self.statement.add_secondary_keyword(condition)
@@ -664,27 +1335,33 @@ class ConditionalColumnSelector(ColumnSelector):
 
 
 class LogicalColumnSelector(ColumnSelector):
+    __slots__ = ()
+
     def complete(self, data_operator):
-        operator_class = self.statement.query.get_query_maker().make(self.OPERATOR_QUERY_PART)
-        logical_operator = operator_class(self.statement.query, data_operator)
+        operator_class = self.statement.query.make(self.OPERATOR_QUERY_PART)
+        logical_operator = operator_class(self.statement, data_operator)
         self.statement.chain_condition([logical_operator])
 
         return self.statement
 
 
 class WhereColumnSelector(ConditionalColumnSelector):
+    __slots__ = ()
     CONDITION_QUERY_PART = 'where'
 
 
 class HavingColumnSelector(ConditionalColumnSelector):
+    __slots__ = ()
     CONDITION_QUERY_PART = 'having'
 
 
 class ANDColumnSelector(LogicalColumnSelector):
+    __slots__ = ()
     OPERATOR_QUERY_PART = 'logical_and'
 
 
 class ORColumnSelector(LogicalColumnSelector):
+    __slots__ = ()
     OPERATOR_QUERY_PART = 'logical_or'
 
 
@@ -694,6 +1371,13 @@ class Query(object):
     def __init__(self, db, table=None, table_alias=None):
         self.db = db
         self.statement = None
+        self.query_parts = self.get_query_maker().query_parts
+
+        self._set_table(table, table_alias)
+
+    def _set_table(self, table, table_alias):
+        if isinstance(table, Statement) and not table_alias:
+            raise BeeSQLError('Derived tables require an alias')
 
         self._table = table
         self.table_alias = table_alias
@@ -711,21 +1395,20 @@ class Query(object):
 
     @property
     def table(self):
+        if isinstance(self._table, Statement):
+            return '({})'.format(self._table.get_sql())
+
         return self._table
 
     def on(self, table, table_alias=None):
+        """ Select the table to operate on. table can be a Statement, used as a derived table. """
         self.reset()
-        self._table = table
-        self.table_alias = table_alias
+        self._set_table(table, table_alias)
         return self
 
     @primary_keyword
     def select(self, *args):
-        q_maker = self.get_query_maker()
-        fields = filter(lambda x: isinstance(x, (str, Alias)), args)
-        agg_fields = filter(lambda x: isinstance(x, AggregationField), args)
-        aggregation_queries = [q_maker.make(agg.QUERY_PART_NAME)(agg.column_name, agg.as_name) for agg in agg_fields]
-        select = self.get_query_maker().make('select')(self, aggregation_queries, *fields)
+        select = self.make('select')(self, None, *args)
         return select
 
     @primary_keyword
@@ -733,24 +1416,43 @@ class Query(object):
         if not kwargs:
             raise BeeSQLError('Values can\'t be empty')
 
-        update = self.get_query_maker().make('update')(self, **kwargs)
+        update = self.make('update')(self, **kwargs)
         return update
 
     @primary_keyword
     def delete(self):
-        delete_keyword = self.get_query_maker().make('delete')(self)
+        delete_keyword = self.make('delete')(self)
         return delete_keyword
 
     @primary_keyword
     def insert(self, *args):
-        insert_keyword = self.get_query_maker().make('insert')(self, *args)
+        insert_keyword = self.make('insert')(self, *args)
         return insert_keyword
 
     @primary_keyword
-    def count(self):
-        count_statement = self.get_query_maker().make('count')(self)
+    def count(self, column_name=None, distinct=False, approximate=False):
+        """ Count rows, non null values of column_name, or distinct values of column_name.
+
+        With approximate=True the number of rows is estimated from table statistics instead of counting
+        them, it can not be combined with column_name or distinct.
+        """
+        count_statement = self.make('count')(self, column_name, distinct=distinct, approximate=approximate)
         return count_statement
 
+    def load_file(self, path, columns=None, format='csv', header=True, batch_size=1000):
+        """ Bulk load a csv or tsv file into the table.
+
+        Returns a LoadResult with the number of rows loaded and the server warnings.
+        """
+        if not self.table:
+            raise BeeSQLError('No table selected. Use Query.on to select a table first')
+
+        with self.db.connect(local_infile=True) as conn:
+            res = conn.load_file(self, path, columns=columns, format=format, header=header,
+                                 batch_size=batch_size)
+
+        return res
+
     def set_statement(self, statement):
         if not isinstance(statement, Statement):
             raise BeeSQLError('Expected instance of {}. got {}'.format(type(Statement), type(statement)))
@@ -760,6 +1462,13 @@ class Query(object):
     def get_query_maker(self):
         return QueryMaker
 
+    def make(self, query_part_name):
+        """ Resolve a query part class from the query parts of this query's dialect. """
+        try:
+            return self.query_parts[query_part_name]
+        except KeyError:
+            raise AttributeError("No query part named '{}'".format(query_part_name))
+
     def get_sql(self):
         if not self.statement:
             raise BeeSQLError('No statement created.')
@@ -793,7 +1502,14 @@ class QueryMaker(metaclass=QueryRegistry):
         'delete': Delete,
         'insert': Insert,
         'count': Count,
+        'union': Union,
+        'explain': Explain,
         'join': Join,
+        'inner_join': InnerJoin,
+        'left_join': LeftJoin,
+        'index_hint': IndexHint,
+        'optimizer_hints': OptimizerHints,
+        'select_modifier': SelectModifier,
         'where': WhereCondition,
         'having': HavingCondition,
         'group_by': GroupBy,
@@ -805,12 +1521,18 @@ class QueryMaker(metaclass=QueryRegistry):
         'not_equal_operator': NotEqualOperator,
         'in_operator': InOperator,
         'not_in_operator': NotInOperator,
+        'condition_group': ConditionGroup,
+        'key_ranges_operator': KeyRangesOperator,
+        'not_null_operator': NotNullOperator,
+        'exists_operator': ExistsOperator,
+        'not_exists_operator': NotExistsOperator,
         'less_than_operator': LessThanOperator,
         'greater_than_operator': GreaterThanOperator,
         'less_than_or_equal_operator': LessThanOrEqualOperator,
         'greater_than_or_equal_operator': GreaterThanOrEqualOperator,
         'count_aggregation': CountAggregation,
         'sum_aggregation': SumAggregation,
+        'count_sum_aggregation': CountSumAggregation,
         'avg_aggregation': AvgAggregation,
         'max_aggregation': MaxAggregation,
         'min_aggregation': MinAggregation,
@@ -1,12 +1,11 @@
 class DataOperatorFuncs(object):
+    __slots__ = ()
+
     def get_operator(self):
         return self.OPERATOR
 
     def get_value(self):
-        if isinstance(self.value, int):
-            return self.value
-
-        return "'{}'".format(self.statement.query.db.escape(self.value))
+        return self.format_value(self.value)
 
 
 class QueryMakerFuncs(object):
@@ -69,6 +68,10 @@ class QueryMakerFuncs(object):
 
 
 class AggregationFuncs(object):
+    __slots__ = ()
+
+    def result_name(self):
+        return self.as_name or '{}_{}'.format(self.FUNCTION_NAME.lower(), self.column_name)
+
     def _get_sql(self):
-        return '{}({}) AS {}'.format(self.FUNCTION_NAME, self.column_name,
-                                     self.as_name or '{}_{}'.format(self.FUNCTION_NAME.lower(), self.column_name))
+        return '{}({}) AS {}'.format(self.FUNCTION_NAME, self.column_name, self.result_name())
@@ -1,5 +1,5 @@
 from .base import Query
-from .base import QueryMaker, Select
+from .base import QueryMaker, Select, IndexHint, OptimizerHints, SelectModifier
 from .mixins import QueryMakerFuncs
 
 
@@ -7,6 +7,27 @@ class MySQLSelect(Select):
     pass
 
 
+class MySQLIndexHint(IndexHint):
+    __slots__ = ()
+
+    def get_sql(self):
+        return '{} INDEX ({})'.format(self.action, ', '.join(self.indexes))
+
+
+class MySQLOptimizerHints(OptimizerHints):
+    __slots__ = ()
+
+    def get_sql(self):
+        return '/*+ {} */'.format(' '.join(self.hints))
+
+
+class MySQLSelectModifier(SelectModifier):
+    __slots__ = ()
+
+    def get_sql(self):
+        return self.modifier
+
+
 class MySQLQuery(Query):
     def get_query_maker(self):
         return MySQLQueryMaker
@@ -17,4 +38,7 @@ class MySQLQueryMaker(QueryMakerFuncs, QueryMaker):
 
     query_parts = {
         'select': MySQLSelect,
+        'index_hint': MySQLIndexHint,
+        'optimizer_hints': MySQLOptimizerHints,
+        'select_modifier': MySQLSelectModifier,
     }
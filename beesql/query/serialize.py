@@ -0,0 +1,212 @@
+""" Plain data representation of statements.
+
+Statements are encoded into nested dicts, lists, strings and numbers which can be pickled or dumped
+as JSON and rebuilt against any DB. Query parts are referenced by their query part name so a
+statement is rebuilt with the dialect classes of the target DB. Other classes are referenced by
+their class path and only resolved when registered with serializable, so decoding never imports
+or instantiates arbitrary classes. Back references to the owning statement, query and DB are left
+out and restored on decode.
+"""
+import datetime
+import decimal
+import hashlib
+import json
+
+from ..exceptions import BeeSQLError
+from ..utils import Alias, Column
+
+VERSION = 1
+
+# attributes restored from context instead of being encoded
+_CONTEXT_ATTRIBUTES = ('statement', 'query')
+
+
+# classes statements may reference besides query parts, by class path
+_serializable_classes = {}
+
+
+def _class_path(cls):
+    return '{}:{}'.format(cls.__module__, cls.__qualname__)
+
+
+def serializable(cls):
+    """ Class decorator allowing statement_from_dict to rebuild instances of cls, or references to it.
+
+    Decoding never imports classes named by the data, so row types given to as_type() need it too.
+    """
+    _serializable_classes[_class_path(cls)] = cls
+    return cls
+
+
+def _resolve_class(path, query):
+    cls = _serializable_classes.get(path)
+    if cls is None:
+        cls = next((part for part in query.query_parts.values() if _class_path(part) == path), None)
+
+    if cls is None:
+        raise BeeSQLError('Class {} is not serializable, decorate it with serializable'.format(path))
+
+    return cls
+
+
+def _attributes(obj):
+    names = []
+    for cls in type(obj).__mro__:
+        slots = cls.__dict__.get('__slots__', ())
+        names.extend([slots] if isinstance(slots, str) else slots)
+
+    names.extend(getattr(obj, '__dict__', {}))
+    return [name for name in names if name not in _CONTEXT_ATTRIBUTES and hasattr(obj, name)]
+
+
+def _is_statement(value):
+    return hasattr(value, 'secondary_keywords') and hasattr(value, 'query')
+
+
+class Encoder(object):
+    def __init__(self, query):
+        self.part_names = {cls: name for name, cls in query.query_parts.items()}
+
+    def encode(self, value):
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+
+        if isinstance(value, list):
+            return [self.encode(item) for item in value]
+
+        if isinstance(value, tuple):
+            return {'tuple': [self.encode(item) for item in value]}
+
+        if isinstance(value, dict):
+            return {'dict': [[self.encode(k), self.encode(v)] for k, v in value.items()]}
+
+        if isinstance(value, datetime.datetime):
+            return {'datetime': value.isoformat()}
+
+        if isinstance(value, datetime.date):
+            return {'date': value.isoformat()}
+
+        if isinstance(value, decimal.Decimal):
+            return {'decimal': str(value)}
+
+        if isinstance(value, Alias):
+            return {'alias': [self.encode(value.name), value.alias]}
+
+        if isinstance(value, Column):
+            return {'column': value.name}
+
+        if isinstance(value, type):
+            return {'type': _class_path(value)}
+
+        if _is_statement(value):
+            return {'statement': statement_to_dict(value)}
+
+        state = {name: self.encode(getattr(value, name)) for name in _attributes(value)}
+        cls = type(value)
+        if cls in self.part_names:
+            return {'part': self.part_names[cls], 'state': state}
+
+        return {'object': _class_path(cls), 'state': state}
+
+
+class Decoder(object):
+    def __init__(self, db, statement):
+        self.db = db
+        self.statement = statement
+
+    def decode(self, value):
+        if not isinstance(value, (list, dict)):
+            return value
+
+        if isinstance(value, list):
+            return [self.decode(item) for item in value]
+
+        kind = data = None
+        if len(value) == 1:
+            kind, data = next(iter(value.items()))
+
+        if kind == 'tuple':
+            return tuple(self.decode(item) for item in data)
+
+        if kind == 'dict':
+            return {self.decode(k): self.decode(v) for k, v in data}
+
+        if kind == 'datetime':
+            return datetime.datetime.fromisoformat(data)
+
+        if kind == 'date':
+            return datetime.date.fromisoformat(data)
+
+        if kind == 'decimal':
+            return decimal.Decimal(data)
+
+        if kind == 'alias':
+            return Alias(self.decode(data[0]), data[1])
+
+        if kind == 'column':
+            return Column(data)
+
+        if kind == 'type':
+            return _resolve_class(data, self.db.query())
+
+        if kind == 'statement':
+            return statement_from_dict(self.db, data)
+
+        if 'part' in value:
+            cls = self.statement.query.make(value['part'])
+        elif 'object' in value:
+            cls = _resolve_class(value['object'], self.db.query())
+        else:
+            raise BeeSQLError('Can not decode {!r}'.format(value))
+
+        return self.restore(cls.__new__(cls), value['state'])
+
+    def restore(self, obj, state):
+        if _has_attribute_slot(obj, 'statement'):
+            obj.statement = self.statement
+
+        for name, value in state.items():
+            setattr(obj, name, self.decode(value))
+
+        return obj
+
+
+def _has_attribute_slot(obj, name):
+    if hasattr(obj, '__dict__'):
+        return False
+
+    return any(name in cls.__dict__.get('__slots__', ()) for cls in type(obj).__mro__)
+
+
+def statement_to_dict(statement):
+    query = statement.query
+    encoder = Encoder(query)
+    return {
+        'version': VERSION,
+        'part': encoder.part_names[type(statement)],
+        'table': encoder.encode(query._table),
+        'table_alias': query.table_alias,
+        'state': {name: encoder.encode(getattr(statement, name)) for name in _attributes(statement)},
+    }
+
+
+def statement_from_dict(db, data):
+    if data.get('version') != VERSION:
+        raise BeeSQLError('Unsupported statement version: {}'.format(data.get('version')))
+
+    query = db.query()
+    table = Decoder(db, None).decode(data['table'])
+    query.on(table, data['table_alias'])
+
+    StatementClass = query.make(data['part'])
+    statement = StatementClass.__new__(StatementClass)
+    statement.query = query
+    Decoder(db, statement).restore(statement, data['state'])
+    query.set_statement(statement)
+    return statement
+
+
+def fingerprint(data):
+    """ Stable hash of an encoded statement. """
+    dump = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(dump.encode('utf-8')).hexdigest()
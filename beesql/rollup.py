@@ -0,0 +1,308 @@
+""" Incrementally maintained summary tables, and routing of aggregate selects to them. """
+import contextlib
+import datetime
+import hashlib
+
+from .exceptions import BeeSQLError
+from .query.base import (
+    WhereCondition, GroupBy, HavingCondition, OrderBy, Limit, ConditionGroup, EqualOperator, NotEqualOperator,
+    InOperator, NotInOperator, LessThanOperator, LessThanOrEqualOperator, GreaterThanOperator,
+    GreaterThanOrEqualOperator, Statement,
+)
+
+STATE_TABLE = 'beesql_rollup_state'
+
+# SQL truncating a time column to the start of its bucket
+granularities = {
+    'minute': "CAST(DATE_FORMAT({}, '%Y-%m-%d %H:%i:00') AS DATETIME)",
+    'hour': "CAST(DATE_FORMAT({}, '%Y-%m-%d %H:00:00') AS DATETIME)",
+    'day': 'DATE({})',
+    'month': "CAST(DATE_FORMAT({}, '%Y-%m-01') AS DATE)",
+}
+
+# how rollup rows of each aggregation are merged, when queried and when refreshed
+merge_functions = {
+    'SUM': 'sum_aggregation',
+    'COUNT': 'count_sum_aggregation',
+    'MAX': 'max_aggregation',
+    'MIN': 'min_aggregation',
+}
+
+# {0} is the summary table column, {1} the newly aggregated value
+merge_updates = {
+    'SUM': '{0} = IFNULL({0}, 0) + IFNULL({1}, 0)',
+    'COUNT': '{0} = {0} + {1}',
+    'MAX': '{0} = COALESCE(GREATEST({0}, {1}), {0}, {1})',
+    'MIN': '{0} = COALESCE(LEAST({0}, {1}), {0}, {1})',
+}
+
+_column_operators = (EqualOperator, NotEqualOperator, InOperator, NotInOperator, LessThanOperator,
+                     LessThanOrEqualOperator, GreaterThanOperator, GreaterThanOrEqualOperator)
+
+
+def as_datetime(value):
+    """ value, a date, datetime or ISO formatted string, as a datetime. """
+    if isinstance(value, str):
+        return datetime.datetime.fromisoformat(value)
+
+    if isinstance(value, datetime.datetime):
+        return value
+
+    return datetime.datetime(value.year, value.month, value.day)
+
+
+def truncate(value, granularity):
+    """ Start of the granularity bucket holding value. """
+    value = as_datetime(value)
+    if granularity == 'minute':
+        return value.replace(second=0, microsecond=0)
+
+    if granularity == 'hour':
+        return value.replace(minute=0, second=0, microsecond=0)
+
+    if granularity == 'day':
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+class Rollup(object):
+    """ Summary table of aggregates over table, grouped by group_by and a time_column bucket of granularity.
+
+    refresh() folds the rows with a key above the last refreshed key into the summary table with
+    INSERT ... SELECT ... ON DUPLICATE KEY UPDATE, so the source table is expected to be append only.
+    Rows can commit after a refresh passed their key, so refresh() also counts the rows in the lag keys
+    below the last refreshed key, and aggregates again the buckets of that window when the count changed.
+    Once refreshed, compatible selects on table are answered from the summary table.
+    """
+    def __init__(self, db, table, group_by, aggregates, granularity=None, time_column=None, key='id', name=None,
+                 route=True, lag=1000):
+        if granularity is not None and granularity not in granularities:
+            raise BeeSQLError('granularity should be one of {}'.format(', '.join(sorted(granularities))))
+
+        if (granularity is None) != (time_column is None):
+            raise BeeSQLError('granularity and time_column are used together')
+
+        if not group_by and time_column is None:
+            raise BeeSQLError('Rollups expect group_by columns or a granularity')
+
+        self.db = db
+        self.table = table
+        self.group_by = list(group_by)
+        self.granularity = granularity
+        self.time_column = time_column
+        self.key = key
+        self.route = route
+        self.lag = lag
+        self.ready = False
+
+        query = db.query(table)
+        self.aggregates = []
+        for field in aggregates:
+            aggregation = query.make(field.QUERY_PART_NAME)(field.column_name, field.as_name)
+            if aggregation.FUNCTION_NAME not in merge_functions:
+                raise BeeSQLError('{} can not be rolled up'.format(aggregation.FUNCTION_NAME))
+
+            self.aggregates.append(aggregation)
+
+        if not self.aggregates:
+            raise BeeSQLError('Rollups expect one or more aggregates')
+
+        self.name = name or '{}_rollup_{}'.format(table, self.definition_hash())
+
+    def __repr__(self):
+        return '< {} >: {} of {}'.format('Rollup', self.name, self.table)
+
+    def definition_hash(self):
+        definition = repr((self.table, self.group_by, self.granularity, self.time_column, self.key,
+                           [ag.get_sql() for ag in self.aggregates]))
+        return hashlib.sha1(definition.encode('utf-8')).hexdigest()[:8]
+
+    @property
+    def columns(self):
+        columns = self.group_by + ([self.time_column] if self.time_column else [])
+        return columns + [ag.result_name() for ag in self.aggregates]
+
+    def source(self, low=None, high=None):
+        """ Select aggregating the source rows with low < key <= high. """
+        query = self.db.query(self.table)
+        group = list(self.group_by)
+        fields = list(self.group_by)
+        if self.time_column:
+            bucket = granularities[self.granularity].format(self.time_column)
+            group.append(bucket)
+            fields.append('{} AS {}'.format(bucket, self.time_column))
+
+        select = query.select(*fields)
+        for aggregation in self.aggregates:
+            select.add_aggregation(aggregation)
+
+        if low is not None:
+            select.where(self.key).gt(low)
+        if high is not None:
+            select.where(self.key).lte(high)
+
+        return select.group_by(*group)
+
+    def _bucket_columns(self, alias=None):
+        """ (expression, name) of the group_by columns and the time bucket of source rows. """
+        prefix = '{}.'.format(alias) if alias else ''
+        columns = [(prefix + column, column) for column in self.group_by]
+        if self.time_column:
+            columns.append((granularities[self.granularity].format(prefix + self.time_column), self.time_column))
+
+        return columns
+
+    def window_rows(self, conn, high, timeout=None):
+        """ Number of source rows with high - lag < key <= high. """
+        count = self.db.query(self.table).count().where(self.key).gt(high - self.lag)._and(self.key).lte(high)
+        return conn.execute(count, timeout=timeout)[0].count
+
+    def recompute(self, conn, low, high):
+        """ Aggregate again, from all rows with key <= high, the buckets holding rows with low < key <= high. """
+        window = 'SELECT DISTINCT {} FROM {} WHERE {} > {} AND {} <= {}'.format(
+            ', '.join('{} AS {}'.format(expr, name) for expr, name in self._bucket_columns()),
+            self.table, self.key, int(low), self.key, int(high))
+        conn.execute_sql('DELETE r FROM {} AS r JOIN ({}) AS w ON {}'.format(
+            self.name, window, ' AND '.join('r.{0} <=> w.{0}'.format(name) for _, name in self._bucket_columns())))
+
+        columns = self._bucket_columns('s')
+        fields = ['{} AS {}'.format(expr, name) for expr, name in columns]
+        for ag in self.aggregates:
+            column = ag.column_name if ag.column_name == '*' else 's.{}'.format(ag.column_name)
+            fields.append('{}({}) AS {}'.format(ag.FUNCTION_NAME, column, ag.result_name()))
+
+        conn.execute_sql('INSERT INTO {} ({}) SELECT {} FROM {} AS s JOIN ({}) AS w ON {} WHERE s.{} <= {} '
+                         'GROUP BY {}'.format(
+                             self.name, ', '.join(self.columns), ', '.join(fields), self.table, window,
+                             ' AND '.join('{} <=> w.{}'.format(expr, name) for expr, name in columns),
+                             self.key, int(high), ', '.join(expr for expr, _ in columns)))
+
+    def create(self, conn):
+        keys = ', '.join(self.group_by + ([self.time_column] if self.time_column else []))
+        conn.execute_sql('CREATE TABLE IF NOT EXISTS {} (UNIQUE KEY rollup_key ({})) {}'.format(
+            self.name, keys, self.source().limit(0).get_sql()))
+        conn.execute_sql('CREATE TABLE IF NOT EXISTS {} (name VARCHAR(191) PRIMARY KEY, watermark BIGINT NULL, '
+                         'window_rows BIGINT NULL)'.format(STATE_TABLE))
+        conn.execute_sql("INSERT IGNORE INTO {} (name, watermark) VALUES ('{}', NULL)".format(
+            STATE_TABLE, self.db.escape(self.name)))
+
+    def refresh(self, timeout=None):
+        """ Fold rows added since the last refresh into the summary table. Returns the key it now covers. """
+        with self.db.connect() as conn:
+            self.create(conn)
+            conn.execute_sql('START TRANSACTION')
+            try:
+                low, window_rows = conn.execute_sql(
+                    "SELECT watermark, window_rows FROM {} WHERE name = '{}' FOR UPDATE".format(
+                        STATE_TABLE, self.db.escape(self.name))).fetchone()
+                if low is not None and self.lag and self.window_rows(conn, low, timeout) != window_rows:
+                    # rows committed after the last refresh with keys it had already passed
+                    self.recompute(conn, low - self.lag, low)
+
+                high = conn.execute(self.db.query(self.table).select().max(self.key, 'high'), timeout=timeout)[0].high
+                if high is not None and (low is None or high > low):
+                    updates = ', '.join(merge_updates[ag.FUNCTION_NAME].format(
+                        '{}.{}'.format(self.name, ag.result_name()), 'VALUES({})'.format(ag.result_name()))
+                        for ag in self.aggregates)
+                    conn.execute_sql('INSERT INTO {} ({}) {} ON DUPLICATE KEY UPDATE {}'.format(
+                        self.name, ', '.join(self.columns), self.source(low, high).get_sql(), updates))
+                    low = high
+
+                if low is not None:
+                    window_rows = self.window_rows(conn, low, timeout) if self.lag else None
+                    conn.execute_sql("UPDATE {} SET watermark = {}, window_rows = {} WHERE name = '{}'".format(
+                        STATE_TABLE, int(low), 'NULL' if window_rows is None else int(window_rows),
+                        self.db.escape(self.name)))
+
+                conn.execute_sql('COMMIT')
+            except BaseException:
+                # a failed ROLLBACK must not hide the error that caused it, the connection drops the transaction
+                with contextlib.suppress(Exception):
+                    conn.execute_sql('ROLLBACK')
+                raise
+
+        self.ready = True
+        return low
+
+    def rebuild(self, timeout=None):
+        """ Empty the summary table and aggregate the whole source table again. """
+        with self.db.connect() as conn:
+            self.create(conn)
+            conn.execute_sql('TRUNCATE TABLE {}'.format(self.name))
+            conn.execute_sql("UPDATE {} SET watermark = NULL, window_rows = NULL WHERE name = '{}'".format(
+                STATE_TABLE, self.db.escape(self.name)))
+
+        return self.refresh(timeout=timeout)
+
+    def _merged_aggregation(self, statement, aggregation):
+        for rolled in self.aggregates:
+            if (rolled.FUNCTION_NAME, rolled.column_name) == (aggregation.FUNCTION_NAME, aggregation.column_name):
+                AggregationClass = statement.query.make(merge_functions[rolled.FUNCTION_NAME])
+                return AggregationClass(rolled.result_name(), aggregation.result_name())
+
+    def _operator_compatible(self, data_operator):
+        if isinstance(data_operator, ConditionGroup):
+            return self._operator_compatible(data_operator.value) and self._condition_compatible(
+                data_operator.logical_operators)
+
+        if not isinstance(data_operator, _column_operators):
+            return False
+
+        values = data_operator.value
+        if not isinstance(data_operator, (InOperator, NotInOperator)):
+            values = [values]
+
+        if any(isinstance(value, Statement) for value in values):
+            return False
+
+        if data_operator.column in self.group_by:
+            return True
+
+        # time bounds are exact on the rollup only when they fall on bucket boundaries
+        if data_operator.column == self.time_column:
+            if not isinstance(data_operator, (GreaterThanOrEqualOperator, LessThanOperator)):
+                return False
+
+            try:
+                return truncate(data_operator.value, self.granularity) == as_datetime(data_operator.value)
+            except (TypeError, ValueError, AttributeError):
+                return False
+
+        return False
+
+    def _condition_compatible(self, logical_operators):
+        return all(self._operator_compatible(lop.data_operator) for lop in logical_operators)
+
+    def rewrite(self, select):
+        """ Statement reading the result of select from the summary table, or None when it can not. """
+        if not (self.ready and self.route) or select.query._table != self.table or select.query.table_alias:
+            return None
+
+        if not select.aggregations or select.sampling is not None:
+            return None
+
+        if any(field not in self.group_by for field in select.fields):
+            return None
+
+        for kw in select.get_secondary_keywords():
+            if isinstance(kw, GroupBy):
+                if any(column not in self.group_by for column in kw.columns):
+                    return None
+            elif isinstance(kw, WhereCondition):
+                if not self._operator_compatible(kw.data_operator) or not self._condition_compatible(
+                        kw.logical_operators):
+                    return None
+            elif not isinstance(kw, (HavingCondition, OrderBy, Limit)):
+                return None
+
+        statement = select.copy()
+        aggregations = [self._merged_aggregation(statement, ag) for ag in select.aggregations]
+        if any(ag is None for ag in aggregations):
+            return None
+
+        statement.query._table = self.name
+        statement.aggregations = aggregations
+        statement.index_hints = []
+        statement.optimizer_hints = []
+        return statement
@@ -0,0 +1,83 @@
+import keyword
+import threading
+from collections import namedtuple, OrderedDict
+
+from .exceptions import BeeSQLError
+from .query.serialize import serializable
+
+# generated constructors, keyed by row type and result columns, least recently used first
+_constructors = OrderedDict()
+_constructors_lock = threading.Lock()
+# ad hoc queries each add a result shape, the least recently used constructors are dropped past this
+MAX_CONSTRUCTORS = 1024
+
+
+def _check_columns(columns):
+    if len(set(columns)) != len(columns):
+        raise BeeSQLError('Duplicate column names in result: {}'.format(', '.join(columns)))
+
+    for column in columns:
+        if not column.isidentifier() or keyword.iskeyword(column):
+            raise BeeSQLError('Column {} is not a valid attribute name. Use an alias'.format(column))
+
+
+class RowFactory(object):
+    """ Builds rows from result tuples with a constructor generated once per result shape. """
+
+    def key(self):
+        raise NotImplementedError
+
+    def get_key(self, columns):
+        return (self.key(), columns)
+
+    def compile(self, columns):
+        raise NotImplementedError
+
+    def constructor(self, columns):
+        key = self.get_key(columns)
+        with _constructors_lock:
+            make = _constructors.get(key)
+            if make is not None:
+                _constructors.move_to_end(key)
+                return make
+
+        _check_columns(columns)
+        make = self.compile(columns)
+        with _constructors_lock:
+            _constructors[key] = make
+            while len(_constructors) > MAX_CONSTRUCTORS:
+                _constructors.popitem(last=False)
+
+        return make
+
+    def make_rows(self, columns, results):
+        make = self.constructor(tuple(columns))
+        return list(map(make, results))
+
+
+@serializable
+class TypeRowFactory(RowFactory):
+    """ Build instances of row_type, passing each column as a keyword argument. """
+    def __init__(self, row_type):
+        self.row_type = row_type
+
+    def key(self):
+        return self.row_type
+
+    def compile(self, columns):
+        arguments = ', '.join(['{}=row[{}]'.format(column, i) for i, column in enumerate(columns)])
+        source = 'def make(row):\n    return row_type({})\n'.format(arguments)
+        namespace = {'row_type': self.row_type}
+        exec(source, namespace)
+        return namespace['make']
+
+
+@serializable
+class NamedTupleRowFactory(RowFactory):
+    """ Build namedtuples with one field per column. """
+
+    def key(self):
+        return namedtuple
+
+    def compile(self, columns):
+        return namedtuple('Row', columns)._make
@@ -0,0 +1,142 @@
+import math
+import random
+
+from .exceptions import BeeSQLError
+from .query.serialize import serializable
+from .prefetch import attach
+from .scan import split_range
+
+
+class SampleEstimate(object):
+    """ How a sampled result was taken. scale is the factor applied to COUNT and SUM aggregations. """
+    def __init__(self, fraction, ranges):
+        self.fraction = fraction
+        self.ranges = ranges
+
+    def __repr__(self):
+        return '< {} >: {:.4%} of keys in {} ranges'.format('SampleEstimate', self.fraction, len(self.ranges))
+
+    @property
+    def scale(self):
+        return 1.0 / self.fraction if self.fraction else None
+
+
+@serializable
+class Sample(object):
+    """ Block sample of a select over key ranges of an integer column.
+
+    The MIN/MAX range of by is split into blocks strata, and one sub-range covering fraction of each
+    stratum is picked at random. With rows, fraction is rows over the estimated number of matching rows.
+    """
+    def __init__(self, by='id', fraction=None, rows=None, seed=None, blocks=100):
+        if (fraction is None) == (rows is None):
+            raise BeeSQLError('sample expects either fraction or rows')
+
+        if fraction is not None and not 0 < fraction <= 1:
+            raise BeeSQLError('sample fraction should be in (0, 1]. Got {}'.format(fraction))
+
+        if rows is not None and rows < 1:
+            raise BeeSQLError('sample rows should be positive. Got {}'.format(rows))
+
+        self.by = by
+        self.fraction = fraction
+        self.rows = rows
+        self.seed = seed
+        self.blocks = blocks
+
+    def __repr__(self):
+        size = '{} rows'.format(self.rows) if self.rows is not None else '{:.4%}'.format(self.fraction)
+        return '< {} >: {} by {}'.format('Sample', size, self.by)
+
+    def key(self):
+        return (self.by, self.fraction, self.rows, self.seed, self.blocks)
+
+    def target_fraction(self, statement, timeout):
+        if self.fraction is not None:
+            return self.fraction
+
+        total = statement.estimate_count(timeout=timeout)
+        return min(1.0, float(self.rows) / total) if total else 1.0
+
+    def plan(self, statement, timeout=None):
+        """ Key ranges [low, high) to read, and the fraction of the key range they cover. """
+        low, high = statement.key_range(self.by, timeout=timeout)
+        if low is None:
+            return [], 1.0
+
+        if not isinstance(low, int) or not isinstance(high, int):
+            raise BeeSQLError('sample requires an integer column. {} is not'.format(self.by))
+
+        fraction = self.target_fraction(statement, timeout)
+        if fraction >= 1:
+            return [(low, high + 1)], 1.0
+
+        rng = random.Random(self.seed)
+        ranges = []
+        for start, end in split_range(low, high, self.blocks):
+            size = end - start
+            width = min(size, max(1, int(round(size * fraction))))
+            offset = start + rng.randrange(size - width + 1)
+            ranges.append((offset, offset + width))
+
+        covered = sum(end - start for start, end in ranges)
+        return ranges, float(covered) / (high - low + 1)
+
+    def execute(self, statement, conn, **kwargs):
+        if statement.row_factory is not None and statement.aggregations:
+            raise BeeSQLError('Sampled aggregations can not be returned through a row factory')
+
+        ranges, fraction = self.plan(statement, timeout=kwargs.get('timeout'))
+        sampled = statement.copy()
+        sampled.sampling = None
+        if ranges:
+            RangesClass = sampled.query.make('key_ranges_operator')
+            sampled.restrict(RangesClass(sampled, self.by, ranges))
+
+        hidden = self.add_error_aggregations(sampled)
+        rows = sampled._execute(conn, **kwargs)
+        if sampled.aggregations:
+            for row in rows:
+                self.scale_row(row, statement.aggregations, hidden, fraction)
+
+        rows.sample = SampleEstimate(fraction, ranges)
+        return rows
+
+    def add_error_aggregations(self, statement):
+        """ Add the sum of squares and count of each SUM and AVG column, used for their error estimates. """
+        hidden = {}
+        for i, ag in enumerate(list(statement.aggregations)):
+            if ag.FUNCTION_NAME not in ('SUM', 'AVG'):
+                continue
+
+            squares, count = 'sample_sq_{}'.format(i), 'sample_n_{}'.format(i)
+            statement.sum('{0} * {0}'.format(ag.column_name), squares)
+            statement.count(ag.column_name, count)
+            hidden[i] = (squares, count)
+
+        return hidden
+
+    def scale_row(self, row, aggregations, hidden, fraction):
+        values = row.values
+        for i, ag in enumerate(aggregations):
+            name = ag.result_name()
+            value = values.get(name)
+            squares, count = (values.pop(column, None) for column in hidden.get(i, (None, None)))
+            if value is None or ag.FUNCTION_NAME not in ('COUNT', 'SUM', 'AVG'):
+                continue
+
+            value = float(value)
+            if ag.FUNCTION_NAME == 'COUNT':
+                estimate = int(round(value / fraction))
+                error = math.sqrt(value * (1 - fraction)) / fraction
+            elif ag.FUNCTION_NAME == 'SUM':
+                estimate = value / fraction
+                error = math.sqrt((1 - fraction) * float(squares or 0)) / fraction
+            else:
+                estimate = value
+                n = float(count or 0)
+                variance = max(float(squares or 0) / n - value * value, 0.0) if n else 0.0
+                error = math.sqrt(variance / n * (1 - fraction)) if n else None
+
+            attach(row, name, estimate)
+            attach(row, '{}_error'.format(name), error)
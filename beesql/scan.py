@@ -0,0 +1,149 @@
+import concurrent.futures
+import json
+import os
+
+from .exceptions import BeeSQLError
+
+# concurrent.futures loads the executor modules on attribute access
+executors = {
+    'thread': 'ThreadPoolExecutor',
+    'process': 'ProcessPoolExecutor',
+}
+
+
+class ScanChunk(object):
+    """ Result of one key range [low, high) of a parallel scan. """
+    def __init__(self, low, high, result):
+        self.low = low
+        self.high = high
+        self.result = result
+
+    def __repr__(self):
+        return '< {} >: [{}, {}) {}'.format('ScanChunk', self.low, self.high, self.result)
+
+
+class ScanCheckpoint(object):
+    """ JSON file holding the chunk ranges of a scan and which of them completed.
+
+    A checkpoint only resumes the scan it was written for: the same sql, split by the same column
+    into the same number of chunks.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.sql = None
+        self.by = None
+        self.chunk_count = None
+        self.chunks = None
+        self.done = set()
+
+    def load(self, sql, by, chunk_count):
+        self.sql = sql
+        self.by = by
+        self.chunk_count = chunk_count
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path) as f:
+            data = json.load(f)
+
+        if (data['sql'], data.get('by'), data.get('chunk_count')) != (sql, by, chunk_count):
+            raise BeeSQLError('Checkpoint {} belongs to a different scan'.format(self.path))
+
+        self.chunks = [tuple(chunk) for chunk in data['chunks']]
+        self.done = set(data['done'])
+
+    def save(self):
+        tmp_path = '{}.tmp'.format(self.path)
+        with open(tmp_path, 'w') as f:
+            json.dump({'sql': self.sql, 'by': self.by, 'chunk_count': self.chunk_count, 'chunks': self.chunks,
+                       'done': sorted(self.done)}, f)
+
+        os.replace(tmp_path, self.path)
+
+    def mark_done(self, index):
+        self.done.add(index)
+        self.save()
+
+
+def split_range(low, high, chunks):
+    """ Split the inclusive integer range [low, high] into at most chunks half-open ranges of balanced size. """
+    total = high - low + 1
+    chunks = max(1, min(chunks, total))
+    bounds = [low + (total * i) // chunks for i in range(chunks + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(chunks)]
+
+
+def run_chunk(statement, callback, timeout):
+    rows = statement.execute(timeout=timeout)
+    if callback is not None:
+        return callback(rows)
+
+    return rows
+
+
+class ParallelScan(object):
+    def __init__(self, statement, by, workers=4, executor='thread', chunks=None, callback=None,
+                 checkpoint=None, timeout=None):
+        if executor not in executors:
+            raise BeeSQLError('executor should be one of {}'.format(', '.join(sorted(executors))))
+
+        self.statement = statement
+        self.by = by
+        self.workers = workers
+        self.executor = executor
+        self.chunks = chunks or workers * 4
+        self.callback = callback
+        self.checkpoint = ScanCheckpoint(checkpoint) if isinstance(checkpoint, str) else checkpoint
+        self.timeout = timeout
+
+    def plan(self):
+        if self.checkpoint is not None:
+            self.checkpoint.load(self.statement.get_sql(), self.by, self.chunks)
+            if self.checkpoint.chunks is not None:
+                return self.checkpoint.chunks
+
+        low, high = self.statement.key_range(self.by, timeout=self.timeout)
+        if low is None:
+            chunks = []
+        elif not isinstance(low, int) or not isinstance(high, int):
+            raise BeeSQLError('parallel_scan requires an integer column. {} is not'.format(self.by))
+        else:
+            chunks = split_range(low, high, self.chunks)
+
+        if self.checkpoint is not None:
+            self.checkpoint.chunks = chunks
+            self.checkpoint.save()
+
+        return chunks
+
+    def chunk_statement(self, low, high):
+        statement = self.statement.copy()
+        ops = [
+            statement.query.make('greater_than_or_equal_operator')(statement, self.by, low),
+            statement.query.make('less_than_operator')(statement, self.by, high),
+        ]
+        return statement.restrict(*ops)
+
+    def __iter__(self):
+        chunks = self.plan()
+        done = self.checkpoint.done if self.checkpoint is not None else set()
+        Executor = getattr(concurrent.futures, executors[self.executor])
+
+        with Executor(max_workers=self.workers) as pool:
+            futures = {}
+            for index, (low, high) in enumerate(chunks):
+                if index in done:
+                    continue
+
+                future = pool.submit(run_chunk, self.chunk_statement(low, high), self.callback, self.timeout)
+                futures[future] = (index, low, high)
+
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    index, low, high = futures[future]
+                    yield ScanChunk(low, high, future.result())
+                    if self.checkpoint is not None:
+                        self.checkpoint.mark_done(index)
+            finally:
+                for future in futures:
+                    future.cancel()
@@ -0,0 +1,215 @@
+import contextlib
+import heapq
+import itertools
+import threading
+import time
+
+from .exceptions import BeeSQLError, AdmissionRejected
+from .settings import PRIORITY_INTERACTIVE, PRIORITY_BATCH
+
+# waiters of a lower rank are admitted first
+priority_ranks = {
+    PRIORITY_INTERACTIVE: 0,
+    PRIORITY_BATCH: 1,
+}
+
+
+class SchedulerMetrics(object):
+    """ Counters of a Scheduler. Wait times are in seconds. """
+    def __init__(self):
+        self.admitted = 0
+        self.rejected = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def __repr__(self):
+        return '< {} >: {} admitted, {} rejected, {:.3f}s average wait'.format(
+            'SchedulerMetrics', self.admitted, self.rejected, self.avg_wait)
+
+    @property
+    def avg_wait(self):
+        return self.total_wait / self.admitted if self.admitted else 0.0
+
+
+class _Waiter(object):
+    def __init__(self, priority):
+        self.priority = priority
+        self.event = threading.Event()
+        self.admitted = False
+        self.abandoned = False
+
+
+class Scheduler(object):
+    """ Admission control in front of statement execution.
+
+    At most max_concurrency statements run at once, batch statements at most max_batch of them, so
+    interactive statements always find free slots. Waiting statements are admitted interactive first,
+    then in arrival order. A statement is rejected with AdmissionRejected when max_queue statements are
+    already waiting, or when its deadline passes, or is expected to pass, before it gets a slot.
+    """
+    # weight of the latest run in the moving average of run durations
+    DURATION_SMOOTHING = 0.2
+
+    def __init__(self, max_concurrency=8, max_batch=None, max_queue=100):
+        if max_concurrency < 1:
+            raise BeeSQLError('max_concurrency should be at least 1')
+
+        self.max_concurrency = max_concurrency
+        self.max_batch = max(1, max_concurrency // 2) if max_batch is None else max_batch
+        self.max_queue = max_queue
+        self.metrics = SchedulerMetrics()
+        self.avg_duration = None
+        self.running = {priority: 0 for priority in priority_ranks}
+        self._queued = {priority: 0 for priority in priority_ranks}
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __repr__(self):
+        return '< {} >: {} running, {} queued'.format('Scheduler', sum(self.running.values()), self.queue_depth)
+
+    def __reduce__(self):
+        # a scheduler only applies to the process it lives in, a pickled DB gets a fresh one
+        return (self.__class__, (self.max_concurrency, self.max_batch, self.max_queue))
+
+    @property
+    def queue_depth(self):
+        return sum(self._queued.values())
+
+    def queued(self, priority):
+        return self._queued[priority]
+
+    def _can_run(self, priority):
+        if sum(self.running.values()) >= self.max_concurrency:
+            return False
+
+        return priority != PRIORITY_BATCH or self.running[PRIORITY_BATCH] < self.max_batch
+
+    def _expected_wait(self, priority):
+        if self.avg_duration is None:
+            return 0.0
+
+        rank = priority_ranks[priority]
+        # queued statements admitted before this one, including it
+        ahead = sum(count for p, count in self._queued.items() if priority_ranks[p] <= rank)
+        slots = self.max_batch if priority == PRIORITY_BATCH else self.max_concurrency
+        return self.avg_duration * ahead / slots
+
+    def _dispatch(self):
+        while self._waiters:
+            _, _, waiter = self._waiters[0]
+            if waiter.abandoned:
+                heapq.heappop(self._waiters)
+                continue
+
+            if not self._can_run(waiter.priority):
+                return
+
+            heapq.heappop(self._waiters)
+            self._start(waiter)
+            waiter.event.set()
+
+    def _start(self, waiter):
+        waiter.admitted = True
+        self._queued[waiter.priority] -= 1
+        self.running[waiter.priority] += 1
+
+    def _abandon(self, waiter):
+        waiter.abandoned = True
+        self._queued[waiter.priority] -= 1
+
+    def _reject(self, message):
+        self.metrics.rejected += 1
+        raise AdmissionRejected(message)
+
+    def acquire(self, priority=PRIORITY_INTERACTIVE, deadline=None):
+        """ Wait for a slot to run a statement of priority. Returns the seconds waited.
+
+        deadline is the number of seconds the caller is willing to wait, None to wait as long as it takes.
+        Statements run by a thread already holding a slot, such as the key range query of a sample, use
+        that slot.
+        """
+        if priority not in priority_ranks:
+            raise BeeSQLError('priority should be one of {}'.format(', '.join(sorted(priority_ranks))))
+
+        depth = getattr(self._local, 'depth', 0)
+        if depth:
+            self._local.depth = depth + 1
+            return 0.0
+
+        start = time.monotonic()
+        waiter = _Waiter(priority)
+        with self._lock:
+            self._queued[priority] += 1
+            heapq.heappush(self._waiters, (priority_ranks[priority], next(self._sequence), waiter))
+            self._dispatch()
+            if not waiter.admitted:
+                expected_wait = self._expected_wait(priority)
+                if self.queue_depth > self.max_queue:
+                    self._abandon(waiter)
+                    self._reject('Queue is full, {} statements waiting'.format(self.max_queue))
+
+                if deadline is not None and expected_wait > deadline:
+                    self._abandon(waiter)
+                    self._reject('Deadline of {}s can not be met, expected wait is {:.3f}s'.format(
+                        deadline, expected_wait))
+
+                self.metrics.max_queue_depth = max(self.metrics.max_queue_depth, self.queue_depth)
+
+        waiter.event.wait(deadline)
+        with self._lock:
+            if not waiter.admitted:
+                self._abandon(waiter)
+                self._reject('Deadline of {}s passed waiting for a slot'.format(deadline))
+
+            waited = time.monotonic() - start
+            self.metrics.admitted += 1
+            self.metrics.total_wait += waited
+            self.metrics.max_wait = max(self.metrics.max_wait, waited)
+
+        self._local.depth = 1
+        return waited
+
+    def try_acquire(self, priority=PRIORITY_INTERACTIVE):
+        """ Take a slot only when one is free and no statement is waiting for it. Returns whether it did. """
+        with self._lock:
+            if self.queue_depth or not self._can_run(priority):
+                return False
+
+            self.running[priority] += 1
+            self.metrics.admitted += 1
+            return True
+
+    def release_slot(self, priority=PRIORITY_INTERACTIVE):
+        """ Free a slot taken with try_acquire. """
+        with self._lock:
+            self.running[priority] -= 1
+            self._dispatch()
+
+    @contextlib.contextmanager
+    def holding(self):
+        """ Run the statements of this thread in a slot acquired by another thread, as nested statements. """
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+
+    def release(self, priority=PRIORITY_INTERACTIVE, duration=None):
+        """ Free the slot of a statement that ran for duration seconds. """
+        self._local.depth -= 1
+        if self._local.depth:
+            return
+
+        with self._lock:
+            self.running[priority] -= 1
+            if duration is not None:
+                if self.avg_duration is None:
+                    self.avg_duration = duration
+                else:
+                    self.avg_duration += self.DURATION_SMOOTHING * (duration - self.avg_duration)
+
+            self._dispatch()
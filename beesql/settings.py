@@ -1,2 +1,17 @@
 DATABASE_MYSQL = 'mysql'
 DATABASE_SQLITE = 'sqlite'
+
+DRIVER_PYMYSQL = 'pymysql'
+DRIVER_MYSQLCLIENT = 'mysqlclient'
+
+EXPORT_FORMAT_CSV = 'csv'
+EXPORT_FORMAT_JSONL = 'jsonl'
+
+LOAD_FORMAT_CSV = 'csv'
+LOAD_FORMAT_TSV = 'tsv'
+
+# server and client errors refusing LOAD DATA LOCAL INFILE, loads fall back to inserts on them
+LOCAL_INFILE_REFUSED_ERRORS = (1148, 2068, 3948)
+
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BATCH = 'batch'
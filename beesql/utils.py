@@ -16,5 +16,15 @@ def alias(name, alias_name):
     return Alias(name, alias_name)
 
 
+class Column(object):
+    """ Reference to a column, rendered unquoted when used as a value. """
+    def __init__(self, name):
+        self.name = name.replace('__', '.')
+
+
+def column(name):
+    return Column(name)
+
+
 def field(table_name, field):
     return '{}__{}'.format(table_name, field)
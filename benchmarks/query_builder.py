@@ -0,0 +1,60 @@
+""" Query builder throughput and allocation benchmark.
+
+Run from the repository root:
+
+    python benchmarks/query_builder.py
+"""
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from beesql import DB  # noqa: E402
+
+db = DB('mysql', 'benchmark')
+
+
+def build_select():
+    return db.query('users').select('id', 'name').where('age').eq(30)
+
+
+def build_chained():
+    return (db.query('users').select('id', 'name', 'age').where(role='editor', active=1)
+            ._and('age').gt(30).order_by('-age').limit(10))
+
+
+def render_chained():
+    return build_chained().get_sql()
+
+
+cases = [
+    ('select().where().eq()', build_select),
+    ('chained build', build_chained),
+    ('chained build + get_sql', render_chained),
+]
+
+
+def allocations(func, iterations=1000):
+    tracemalloc.start()
+    func()
+    before = tracemalloc.take_snapshot()
+    kept = [func() for _ in range(iterations)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    size = sum(stat.size_diff for stat in stats)
+    del kept
+    return size / iterations
+
+
+def main(number=20000):
+    print('{:<28} {:>12} {:>16}'.format('case', 'ops/sec', 'bytes retained'))
+    for name, func in cases:
+        seconds = min(timeit.repeat(func, number=number, repeat=3))
+        print('{:<28} {:>12,.0f} {:>16,.0f}'.format(name, number / seconds, allocations(func)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,9 @@
 from setuptools import setup
 
 requires = ['PyMySQL']
+extras = {
+    'mysqlclient': ['mysqlclient'],
+}
 packages = [
     'beesql', 'beesql.query',
 ]
@@ -11,5 +14,6 @@ setup(
     author='Kasun Herath',
     author_email='kasunh01@gmail.com',
     install_requires=requires,
+    extras_require=extras,
     packages=packages,
 )